@@ -0,0 +1,62 @@
+"""
+Скорость страниц через кэш страниц: промах (рендеринг шаблона) и попадание.
+
+Запуск из папки MyFramework:
+    python -m benchmarks.bench_cache
+"""
+import io
+import time
+
+from lite_framework.cache import ResponseCache
+from lite_framework.main import LiteFramework
+from patterns.сreational_patterns import Note
+from urls import fronts
+from views import routes, site
+
+
+def call(application, path, query=''):
+    environ = {
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': path,
+        'QUERY_STRING': query,
+        'wsgi.input': io.BytesIO(),
+    }
+    status = []
+    body = b''.join(application(environ, lambda code, headers: status.append(code)))
+    return status[0], body
+
+
+def measure(application, path, query, seconds):
+    count = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        call(application, path, query)
+        count += 1
+    return count / (time.perf_counter() - started)
+
+
+def main(notes=200, seconds=1.0):
+    if not len(site.categories):
+        site.add_category(site.create_category('bench'))
+    category = next(iter(site.categories))
+    for number in range(notes):
+        site.add_note(Note(f'note {number}', 'description', category))
+
+    cache = ResponseCache()
+    uncached = LiteFramework(routes, fronts, cache=None)
+    cached = LiteFramework(routes, fronts, cache=cache)
+    pages = [('/', ''), ('/category/', ''), ('/note-list/', f'id={category.id}'), ('/api/', '')]
+
+    results = []
+    for path, query in pages:
+        assert call(cached, path, query) == call(uncached, path, query)
+        miss = measure(uncached, path, query, seconds)
+        hit = measure(cached, path, query, seconds)
+        print(f'{path:14s} без кэша: {miss:8.0f} запр/с  из кэша: {hit:8.0f} запр/с  ({hit / miss:5.1f}x)')
+        results.append({'path': path, 'uncached_rps': miss, 'cached_rps': hit})
+    print('кэш:', cache.stats())
+    return results
+
+
+if __name__ == '__main__':
+    main()
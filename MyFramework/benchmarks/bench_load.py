@@ -0,0 +1,306 @@
+"""
+Нагрузочный тест приложения в одном процессе: LiteFramework вызывается напрямую
+с синтетическими WSGI environ для всех маршрутов views.routes (включая POST
+создания заметки, категории, читателя и связи читателя с заметками).
+Для каждого размера набора данных - запросы/с, задержки p50/p95/p99 и память
+на запрос; результаты сохраняются в JSON для сравнения между версиями.
+
+Запуск из папки MyFramework:
+    python -m benchmarks.bench_load [--sizes 100,1000,10000] [--requests 200] [--output load.json]
+    python -m benchmarks.bench_load --compare old.json new.json
+"""
+import argparse
+import io
+import json
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from itertools import count
+from multiprocessing import get_context
+from urllib.parse import urlencode
+
+# Запросов на маршрут с включённым tracemalloc (он замедляет работу - замер отдельный).
+ALLOC_REQUESTS = 20
+# Разогрев маршрута перед замером.
+WARMUP_REQUESTS = 5
+
+
+def make_environ(method, path, params=None):
+    query = urlencode(params or {})
+    environ = {
+        'REQUEST_METHOD': method,
+        'PATH_INFO': path,
+        'QUERY_STRING': '',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'wsgi.input': io.BytesIO(),
+    }
+    if method == 'POST':
+        body = query.encode('utf-8')
+        environ['CONTENT_TYPE'] = 'application/x-www-form-urlencoded'
+        environ['CONTENT_LENGTH'] = str(len(body))
+        environ['wsgi.input'] = io.BytesIO(body)
+    else:
+        environ['QUERY_STRING'] = query
+    return environ
+
+
+def call(application, environ):
+    status = []
+    result = application(environ, lambda code, headers: status.append(code))
+    try:
+        body = b''.join(result)
+    finally:
+        close = getattr(result, 'close', None)
+        if close:
+            close()
+    return status[0], body
+
+
+def seed(site, size):
+    """
+    Наполнение Engine через фабрики: size заметок, категорий и читателей
+    пропорционально меньше. Типы заметок чередуются.
+    :return: (категории, заметки, читатели)
+    """
+    from patterns.сreational_patterns import NoteFactory, UserFactory
+
+    types = list(NoteFactory.types)
+    categories = []
+    for number in range(max(1, size // 50)):
+        # Каждая пятая категория - вложенная.
+        parent = categories[-1] if number % 5 == 4 else None
+        category = site.create_category(f'category {number}', parent)
+        site.add_category(category)
+        categories.append(category)
+    notes = []
+    for number in range(size):
+        note = NoteFactory.create(types[number % len(types)], f'note {number} word{number % 100}',
+                                  f'<p>description {number} text{number % 1000}</p>',
+                                  categories[number % len(categories)])
+        site.add_note(note)
+        notes.append(note)
+    readers = []
+    for number in range(max(1, size // 10)):
+        reader = UserFactory.create('reader', f'reader {number}')
+        site.add_reader(reader)
+        readers.append(reader)
+    return categories, notes, readers
+
+
+def scenarios(site, categories, notes, readers):
+    """
+    Сценарии: (маршрут в routes, метод, функция номер запроса -> (путь, параметры)).
+    Удаление получает свой объект, созданный вне замера времени.
+    """
+    from patterns.сreational_patterns import NoteFactory, UserFactory
+
+    category, note, reader = categories[0], notes[0], readers[0]
+    linked = [item.id for item in notes[:10]]
+
+    def new_note(number):
+        item = NoteFactory.create('common', f'delete {number}', 'description', category)
+        site.add_note(item)
+        return item.id
+
+    def new_reader(number):
+        item = UserFactory.create('reader', f'delete {number}')
+        site.add_reader(item)
+        return item.id
+
+    link_form = {'link': reader.id}
+    for id in linked:
+        link_form[f'note_shown_{id}'] = id
+    for id in linked[::2]:
+        link_form[f'note_checkbox_{id}'] = id
+
+    return [
+        ('/', 'GET', lambda n: ('/', {})),
+        ('/about/', 'GET', lambda n: ('/about/', {})),
+        ('/category/', 'GET', lambda n: ('/category/', {})),
+        ('/note-list/', 'GET', lambda n: ('/note-list/', {'id': category.id})),
+        ('/note-list/<int:id>/', 'GET', lambda n: (f'/note-list/{category.id}/', {'page': 2})),
+        ('/reader-list/', 'GET', lambda n: ('/reader-list/', {})),
+        ('/link-reader/', 'GET', lambda n: ('/link-reader/', {'id': reader.id})),
+        ('/create-category/', 'GET', lambda n: ('/create-category/', {})),
+        # GET запоминает категорию в контроллере - POST создаёт заметку в ней.
+        ('/create-note/', 'GET', lambda n: ('/create-note/', {'id': category.id})),
+        ('/create-note/', 'POST', lambda n: ('/create-note/', {'note_name': f'created {n}',
+                                                              'description': 'created by benchmark'})),
+        ('/create-category/', 'POST', lambda n: ('/create-category/', {'category_name': f'created {n}',
+                                                                      'category_id': category.id})),
+        ('/reader-list/', 'POST', lambda n: ('/reader-list/', {'reader_name': f'created {n}'})),
+        ('/link-reader/', 'POST', lambda n: ('/link-reader/', link_form)),
+        # Копирование - ссылка в списке заметок, то есть GET.
+        ('/copy-note/', 'GET', lambda n: ('/copy-note/', {'id': note.id})),
+        ('/delete_note/', 'GET', lambda n: ('/delete_note/', {'id': new_note(n)})),
+        ('/delete-reader/', 'GET', lambda n: ('/delete-reader/', {'id': new_reader(n)})),
+        ('/api/', 'GET', lambda n: ('/api/', {})),
+        ('/api/<slug:resource>/', 'GET', lambda n: ('/api/readers/', {'limit': 50, 'fields': 'id,name'})),
+        ('/api/<slug:resource>/', 'GET', lambda n: ('/api/notes/', {'format': 'jsonl'})),
+        ('/search/', 'GET', lambda n: ('/search/', {'q': 'description wor'})),
+        ('/api/search/', 'GET', lambda n: ('/api/search/', {'q': 'text1', 'category': category.id})),
+        ('/cache-stats/', 'GET', lambda n: ('/cache-stats/', {})),
+        ('404', 'GET', lambda n: ('/missing/', {})),
+    ]
+
+
+def percentile(values, quantiles, point):
+    return quantiles[point - 1] if len(values) > 1 else values[0]
+
+
+def run_scenario(application, method, build, requests, numbers):
+    # Построение environ (и подготовка объектов) в замер времени не входит.
+    for _ in range(WARMUP_REQUESTS):
+        call(application, make_environ(method, *build(next(numbers))))
+
+    statuses = Counter()
+    timings = []
+    for _ in range(requests):
+        environ = make_environ(method, *build(next(numbers)))
+        started = time.perf_counter_ns()
+        status, body = call(application, environ)
+        timings.append(time.perf_counter_ns() - started)
+        statuses[status] += 1
+
+    peaks, retained = [], []
+    tracemalloc.start()
+    for _ in range(min(ALLOC_REQUESTS, requests)):
+        environ = make_environ(method, *build(next(numbers)))
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        call(application, environ)
+        current, peak = tracemalloc.get_traced_memory()
+        peaks.append(peak - before)
+        retained.append(current - before)
+    tracemalloc.stop()
+
+    milliseconds = [value / 1e6 for value in timings]
+    quantiles = statistics.quantiles(milliseconds, n=100) if len(milliseconds) > 1 else milliseconds
+    return {
+        'requests': requests,
+        'status': statuses.most_common(1)[0][0],
+        'rps': requests / (sum(timings) / 1e9),
+        'mean_ms': statistics.fmean(milliseconds),
+        'p50_ms': percentile(milliseconds, quantiles, 50),
+        'p95_ms': percentile(milliseconds, quantiles, 95),
+        'p99_ms': percentile(milliseconds, quantiles, 99),
+        'alloc_peak_bytes': statistics.median(peaks),
+        'alloc_retained_bytes': statistics.median(retained),
+    }
+
+
+def run_size(size, requests, use_cache):
+    """
+    Замер одного размера набора данных. Выполняется в отдельном процессе:
+    views.site - глобальный Engine, и каждый размер начинается с чистого состояния.
+    """
+    from lite_framework.main import LiteFramework
+    from urls import fronts
+    from views import routes, site
+
+    categories, notes, readers = seed(site, size)
+    application = LiteFramework(routes, fronts) if use_cache else LiteFramework(routes, fronts, cache=None)
+    numbers = count()
+    results = []
+    covered = set()
+    for route, method, build in scenarios(site, categories, notes, readers):
+        path, params = build(0)
+        result = run_scenario(application, method, build, requests, numbers)
+        result.update(size=size, route=route, method=method, path=path,
+                      query=urlencode(params) if method == 'GET' else '')
+        results.append(result)
+        covered.add(route)
+    missing = sorted(set(routes) - covered)
+    return results, missing
+
+
+def report(results):
+    print(f'{"size":>7s} {"method":6s} {"path":22s} {"status":16s} {"запр/с":>9s} '
+          f'{"p50 мс":>8s} {"p95 мс":>8s} {"p99 мс":>8s} {"пик КБ":>8s}')
+    for item in results:
+        print(f'{item["size"]:7d} {item["method"]:6s} {item["path"]:22.22s} {item["status"]:16.16s} '
+              f'{item["rps"]:9.0f} {item["p50_ms"]:8.3f} {item["p95_ms"]:8.3f} {item["p99_ms"]:8.3f} '
+              f'{item["alloc_peak_bytes"] / 1024:8.1f}')
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def result_key(item):
+    return item['size'], item['method'], item['path'], item['query']
+
+
+def compare(old_path, new_path):
+    """
+    Сравнение двух файлов результатов: отношение запросов/с и изменение p95.
+    :return: список строк сравнения
+    """
+    with open(old_path, encoding='utf-8') as file:
+        old = {result_key(item): item for item in json.load(file)['results']}
+    with open(new_path, encoding='utf-8') as file:
+        new = json.load(file)['results']
+    rows = []
+    for item in new:
+        base = old.get(result_key(item))
+        if base is None:
+            continue
+        rows.append({
+            'size': item['size'], 'method': item['method'], 'path': item['path'],
+            'rps_ratio': item['rps'] / base['rps'],
+            'p95_delta_ms': item['p95_ms'] - base['p95_ms'],
+        })
+        print(f'{item["size"]:7d} {item["method"]:6s} {item["path"]:22.22s} '
+              f'запр/с: {rows[-1]["rps_ratio"]:5.2f}x  p95: {rows[-1]["p95_delta_ms"]:+8.3f} мс')
+    return rows
+
+
+def main(sizes=(100, 1000, 10000), requests=200, output='load.json', use_cache=True):
+    results = []
+    # spawn: каждый размер - в новом процессе с чистым views.site.
+    context = get_context('spawn')
+    for size in sizes:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            size_results, missing = executor.submit(run_size, size, requests, use_cache).result()
+        if missing:
+            print('маршруты без сценария:', ', '.join(missing))
+        results.extend(size_results)
+    report(results)
+    data = {
+        'meta': {
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'requests': requests,
+            'cache': use_cache,
+        },
+        'results': results,
+    }
+    if output:
+        with open(output, 'w', encoding='utf-8') as file:
+            json.dump(data, file, ensure_ascii=False, indent=1)
+        print('результаты:', output)
+    return data
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Нагрузочный тест LiteFramework')
+    parser.add_argument('--sizes', default='100,1000,10000', help='размеры набора данных через запятую')
+    parser.add_argument('--requests', type=int, default=200, help='запросов на сценарий')
+    parser.add_argument('--output', default='load.json', help='файл результатов JSON')
+    parser.add_argument('--no-cache', action='store_true', help='без кэша страниц')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help='сравнить два файла результатов')
+    args = parser.parse_args()
+    if args.compare:
+        compare(*args.compare)
+    else:
+        main(tuple(int(size) for size in args.sizes.split(',')), args.requests, args.output, not args.no_cache)
@@ -0,0 +1,61 @@
+"""
+Замер памяти на одну заметку.
+
+Запуск из папки MyFramework:
+    python -m benchmarks.bench_memory [количество заметок]
+"""
+import sys
+import tracemalloc
+
+from patterns.сreational_patterns import Category, CommonNote
+
+
+# Прежнее устройство заметки: __dict__ у экземпляра и свой список наблюдателей.
+class DictNote:
+
+    def __init__(self, id, name, description, category):
+        self.observers = []
+        self.id = id
+        self.name = name
+        self.description = description
+        self.category = category
+        self.reader = None
+
+
+def measure(factory, count):
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    notes = [factory(i) for i in range(count)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    size = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    # Список самих ссылок на заметки в замер не входит.
+    size -= sys.getsizeof(notes)
+    return size / count
+
+
+def main(count=100_000):
+    category = Category('bench', None)
+    email, sms = object(), object()
+    name, description = 'name', 'description'
+
+    def dict_note(i):
+        note = DictNote(i, name, description, category)
+        note.observers.append(email)
+        note.observers.append(sms)
+        return note
+
+    def slotted_note(i):
+        return CommonNote(name, description, category)
+
+    old = measure(dict_note, count)
+    new = measure(slotted_note, count)
+    print(f'заметок: {count}')
+    print(f'__dict__ + список наблюдателей: {old:.1f} байт на заметку')
+    print(f'__slots__, наблюдатели на класс: {new:.1f} байт на заметку')
+    print(f'экономия: {(1 - new / old) * 100:.0f}%')
+    return {'count': count, 'dict_bytes_per_note': old, 'slots_bytes_per_note': new}
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
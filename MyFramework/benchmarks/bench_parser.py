@@ -0,0 +1,54 @@
+"""
+Разбор больших форм: прежний split + quopri против parse_query.
+
+Запуск из папки MyFramework:
+    python -m benchmarks.bench_parser
+"""
+import quopri
+import timeit
+from urllib.parse import quote_plus
+
+from lite_framework.lite_requests import parse_query
+
+
+# Прежний разбор: split по & и =, затем декодирование каждого поля через quopri.
+def old_parse(data):
+    result = {}
+    if data:
+        params = data.split('&')
+        for item in params:
+            k, v = item.split('=')
+            result[k] = v
+    return result
+
+
+def old_decode(data):
+    new_data = {}
+    for k, v in data.items():
+        val = bytes(v.replace('%', '=').replace("+", " "), 'UTF-8')
+        new_data[k] = quopri.decodestring(val).decode('UTF-8')
+    return new_data
+
+
+def build_form(fields):
+    items = [f'note_checkbox_{i}={i}' for i in range(fields)]
+    items.append(f'description={quote_plus("Описание заметки " * 200)}')
+    items.append(f'note_name={quote_plus("Заметка про map() и zip()")}')
+    return '&'.join(items)
+
+
+def main(sizes=(10, 100, 900), number=2000):
+    results = []
+    for fields in sizes:
+        form = build_form(fields)
+        assert old_decode(old_parse(form))['description'] == parse_query(form)['description']
+        old = timeit.timeit(lambda: old_decode(old_parse(form)), number=number) / number * 1e6
+        new = timeit.timeit(lambda: parse_query(form), number=number) / number * 1e6
+        print(f'полей: {fields + 2:5d}  split+quopri: {old:8.1f} мкс  parse_query: {new:8.1f} мкс  '
+              f'ускорение: {old / new:4.1f}x')
+        results.append({'fields': fields + 2, 'old_us': old, 'new_us': new})
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+"""
+Скорость поиска маршрута в зависимости от числа маршрутов.
+
+Запуск из папки MyFramework:
+    python -m benchmarks.bench_router
+"""
+import timeit
+
+from lite_framework.router import Router
+
+
+def build_routes(count):
+    routes = {}
+    for i in range(count):
+        if i % 2:
+            routes[f'/section-{i}/<int:id>/'] = f'view-{i}'
+        else:
+            routes[f'/page-{i}/'] = f'view-{i}'
+    return routes
+
+
+def main(sizes=(10, 100, 300, 1000), number=200_000):
+    results = []
+    for count in sizes:
+        router = Router(build_routes(count))
+        last_static = f'/page-{(count - 1) // 2 * 2}/'
+        last_param = f'/section-{count - 1 if count % 2 == 0 else count - 2}/42/'
+        assert router.match(last_static)[0] is not None
+        assert router.match(last_param)[1] == {'id': 42}
+        static = timeit.timeit(lambda: router.match(last_static), number=number) / number * 1e9
+        param = timeit.timeit(lambda: router.match(last_param), number=number) / number * 1e9
+        missing = timeit.timeit(lambda: router.match('/nope/1/'), number=number) / number * 1e9
+        print(f'маршрутов: {count:5d}  статический: {static:6.0f} нс  '
+              f'с параметром: {param:6.0f} нс  не найден: {missing:6.0f} нс')
+        results.append({'routes': count, 'static_ns': static, 'param_ns': param, 'missing_ns': missing})
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+"""
+Задержка поиска по инвертированному индексу на большом числе заметок.
+
+Запуск из папки MyFramework:
+    python -m benchmarks.bench_search [число заметок]
+"""
+import sys
+import time
+
+from patterns.сreational_patterns import Engine, Note
+
+# Одно слово, префикс, редкое + частое слово, два частых слова (пересечение на всю коллекцию),
+# точное название и отсутствующее слово.
+QUERIES = ('common', 'word5', 'body12 common', 'common text', 'text common bo', 'n1999', 'missing')
+
+
+def main(notes=100000, repeat=100):
+    site = Engine()
+    category = site.create_category('bench')
+    site.add_category(category)
+    started = time.perf_counter()
+    for number in range(notes):
+        site.add_note(Note(f'n{number} word{number % 1000}', f'text body{number % 5000} common', category))
+    print(f'индексация {notes} заметок: {time.perf_counter() - started:.2f} с')
+
+    results = []
+    for query in QUERIES:
+        started = time.perf_counter()
+        for _ in range(repeat):
+            found, has_next = site.search_notes(query, limit=20)
+        elapsed = (time.perf_counter() - started) / repeat * 1000
+        print(f'{query!r:18s} найдено: {len(found):3d}  {elapsed:8.3f} мс')
+        results.append({'query': query, 'found': len(found), 'ms': elapsed})
+    return results
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,214 @@
+import asyncio
+import signal
+import traceback
+from http import HTTPStatus
+from urllib.parse import unquote
+
+from lite_framework.settings import ASGI_MAX_CONNECTIONS, KEEP_ALIVE_TIMEOUT, SHUTDOWN_TIMEOUT, MAX_BODY_SIZE
+from patterns.сreational_patterns import Logger
+
+MAX_HEADERS_SIZE = 65536
+
+logger = Logger('server')
+
+
+class HttpError(Exception):
+
+    def __init__(self, status):
+        super().__init__(status)
+        self.status = status
+
+
+class AsgiServer:
+    """
+    HTTP/1.1 сервер на asyncio для ASGI-приложения.
+    Одно событийное ядро держит тысячи keep-alive соединений.
+    """
+
+    def __init__(self, application, host, port, max_connections=ASGI_MAX_CONNECTIONS,
+                 keep_alive_timeout=KEEP_ALIVE_TIMEOUT):
+        self.application = application
+        self.host = host
+        self.port = port
+        self.keep_alive_timeout = keep_alive_timeout
+        self.connections = asyncio.Semaphore(max_connections)
+        self.tasks = set()
+        self.draining = False
+        self.server = None
+
+    async def handle_connection(self, reader, writer):
+        async with self.connections:
+            task = asyncio.current_task()
+            self.tasks.add(task)
+            try:
+                while not self.draining:
+                    try:
+                        head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), self.keep_alive_timeout)
+                    except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                        break
+                    except asyncio.LimitOverrunError:
+                        await self.send_error(writer, HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE)
+                        break
+                    try:
+                        keep_alive = await self.handle_request(head, reader, writer)
+                    except HttpError as error:
+                        await self.send_error(writer, error.status)
+                        break
+                    if not keep_alive:
+                        break
+            finally:
+                self.tasks.discard(task)
+                writer.close()
+                try:
+                    await writer.wait_closed()
+                except ConnectionError:
+                    pass
+
+    @staticmethod
+    def parse_head(head):
+        lines = head.decode('latin-1').split('\r\n')
+        try:
+            method, target, version = lines[0].split(' ')
+        except ValueError:
+            raise HttpError(HTTPStatus.BAD_REQUEST)
+        headers = []
+        for line in lines[1:]:
+            if not line:
+                continue
+            name, sep, value = line.partition(':')
+            if not sep:
+                raise HttpError(HTTPStatus.BAD_REQUEST)
+            headers.append((name.strip().lower(), value.strip()))
+        return method, target, version, headers
+
+    async def handle_request(self, head, reader, writer):
+        method, target, version, headers = self.parse_head(head)
+        header_dict = dict(headers)
+        if 'chunked' in header_dict.get('transfer-encoding', ''):
+            raise HttpError(HTTPStatus.LENGTH_REQUIRED)
+        length = header_dict.get('content-length', '0')
+        if not length.isdigit():
+            raise HttpError(HTTPStatus.BAD_REQUEST)
+        if int(length) > MAX_BODY_SIZE:
+            raise HttpError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+        body = await reader.readexactly(int(length)) if int(length) else b''
+
+        connection = header_dict.get('connection', '').lower()
+        keep_alive = connection != 'close' if version == 'HTTP/1.1' else connection == 'keep-alive'
+
+        path, _, query = target.partition('?')
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': version.split('/', 1)[-1],
+            'method': method,
+            'scheme': 'http',
+            'path': unquote(path),
+            'raw_path': path.encode('latin-1'),
+            'query_string': query.encode('latin-1'),
+            'root_path': '',
+            'headers': [(name.encode('latin-1'), value.encode('latin-1')) for name, value in headers],
+            'client': writer.get_extra_info('peername'),
+            'server': (self.host, self.port),
+        }
+        state = {'body_sent': False, 'started': False, 'chunked': False, 'keep_alive': keep_alive}
+
+        async def receive():
+            if state['body_sent']:
+                return {'type': 'http.disconnect'}
+            state['body_sent'] = True
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                state['started'] = True
+                response_headers = [(name.decode('latin-1'), value.decode('latin-1'))
+                                    for name, value in message.get('headers', [])]
+                # У 1xx, 204 и 304 тела нет - ни Content-Length, ни chunked не нужны.
+                if not any(name.lower() == 'content-length' for name, value in response_headers) and \
+                        message['status'] not in (204, 304) and message['status'] >= 200:
+                    if version == 'HTTP/1.1':
+                        state['chunked'] = True
+                        response_headers.append(('Transfer-Encoding', 'chunked'))
+                    else:
+                        state['keep_alive'] = False
+                if not state['keep_alive'] or self.draining:
+                    response_headers.append(('Connection', 'close'))
+                elif version != 'HTTP/1.1':
+                    response_headers.append(('Connection', 'keep-alive'))
+                status = HTTPStatus(message['status'])
+                lines = [f'HTTP/1.1 {status.value} {status.phrase}']
+                lines.extend(f'{name}: {value}' for name, value in response_headers)
+                writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+            elif message['type'] == 'http.response.body':
+                data = message.get('body', b'')
+                if method != 'HEAD':
+                    if state['chunked']:
+                        if data:
+                            writer.write(f'{len(data):X}\r\n'.encode('latin-1') + data + b'\r\n')
+                        if not message.get('more_body', False):
+                            writer.write(b'0\r\n\r\n')
+                    else:
+                        writer.write(data)
+                await writer.drain()
+
+        try:
+            await self.application(scope, receive, send)
+        except (asyncio.CancelledError, ConnectionError):
+            raise
+        except Exception:
+            # Ошибка приложения: до начала ответа - 500, после - только закрываем соединение.
+            self.log_error(scope)
+            if not state['started']:
+                raise HttpError(HTTPStatus.INTERNAL_SERVER_ERROR)
+            return False
+        return state['keep_alive'] and not self.draining
+
+    @staticmethod
+    def log_error(scope):
+        logger.error('Ошибка обработки %s %s\n%s', scope['method'], scope['path'], traceback.format_exc())
+
+    @staticmethod
+    async def send_error(writer, status):
+        status = HTTPStatus(status)
+        writer.write(f'HTTP/1.1 {status.value} {status.phrase}\r\n'
+                     f'Content-Length: 0\r\nConnection: close\r\n\r\n'.encode('latin-1'))
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+    async def serve(self):
+        loop = asyncio.get_running_loop()
+        stop = asyncio.Event()
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            try:
+                loop.add_signal_handler(signum, stop.set)
+            except (NotImplementedError, RuntimeError):
+                pass
+
+        # Протокол lifespan: сообщаем приложению о запуске и остановке.
+        lifespan_in = asyncio.Queue()
+        lifespan_out = asyncio.Queue()
+        lifespan = asyncio.ensure_future(self.application({'type': 'lifespan'}, lifespan_in.get, lifespan_out.put))
+        await lifespan_in.put({'type': 'lifespan.startup'})
+        await lifespan_out.get()
+
+        self.server = await asyncio.start_server(self.handle_connection, self.host, self.port,
+                                                 limit=MAX_HEADERS_SIZE)
+        print(f'Starting asyncio server http://{self.host}:{self.port}')
+        await stop.wait()
+
+        # Мягкая остановка: не принимаем новые соединения, ждём текущие.
+        self.draining = True
+        self.server.close()
+        if self.tasks:
+            await asyncio.wait(list(self.tasks), timeout=SHUTDOWN_TIMEOUT)
+        await self.server.wait_closed()
+        await lifespan_in.put({'type': 'lifespan.shutdown'})
+        await lifespan_out.get()
+        await lifespan
+
+
+def serve(application, host, port, **kwargs):
+    asyncio.run(AsgiServer(application, host, port, **kwargs).serve())
@@ -0,0 +1,101 @@
+import threading
+from collections import OrderedDict
+from urllib.parse import parse_qsl
+
+from lite_framework.settings import RESPONSE_CACHE_ENTRIES, RESPONSE_CACHE_BYTES
+
+
+def cache_key(request):
+    """
+    Ключ страницы: адрес, параметры запроса без пустых значений в порядке имён
+    и данные front controllers (например, год в подвале).
+    """
+    environ = request.environ
+    query = tuple(sorted(item for item in parse_qsl(environ.get('QUERY_STRING', '')) if item[1]))
+    data = request.get('data')
+    front_data = tuple(sorted((key, str(value)) for key, value in data.items())) if data else ()
+    return environ.get('PATH_INFO', ''), query, front_data
+
+
+class LRUCache:
+    """
+    Кэш с вытеснением давно не использованных записей (LRU).
+    Ограничен числом записей и суммарным размером значений.
+    Запись хранит номер версии данных, из которых она построена:
+    если номер изменился, запись устарела и удаляется при обращении.
+    """
+
+    def __init__(self, max_entries, max_bytes):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key, version=None):
+        """
+        :param version: текущий номер версии зависимых данных
+        :return: значение или None
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[0] != version:
+                self._remove(key)
+                self.invalidations += 1
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, version, value, size):
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = (version, value, size)
+            self.size += size
+            while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+                self._remove(next(iter(self.entries)))
+                self.evictions += 1
+
+    def _remove(self, key):
+        self.size -= self.entries.pop(key)[2]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def stats(self):
+        with self.lock:
+            return {
+                'entries': len(self.entries),
+                'bytes': self.size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
+
+
+class ResponseCache(LRUCache):
+    """Кэш готовых страниц: значение - (заголовки, тело в bytes)."""
+
+    def __init__(self, max_entries=RESPONSE_CACHE_ENTRIES, max_bytes=RESPONSE_CACHE_BYTES):
+        super().__init__(max_entries, max_bytes)
+
+    def set(self, key, version, headers, body):
+        super().set(key, version, (headers, body), len(body))
+
+
+# Общий кэш приложения.
+response_cache = ResponseCache()
@@ -0,0 +1,115 @@
+import gzip
+import zlib
+from functools import lru_cache
+
+from lite_framework.settings import COMPRESS_LEVEL, COMPRESS_MIN_SIZE, STREAM_CHUNK_SIZE
+
+# Типы содержимого, которые имеет смысл сжимать.
+COMPRESSIBLE_TYPES = ('text/', 'application/json', 'application/x-ndjson', 'application/javascript',
+                      'application/xml', 'image/svg+xml')
+
+# wbits для zlib.compressobj: gzip-обёртка и zlib-обёртка (HTTP deflate).
+WBITS = {'gzip': 31, 'deflate': 15}
+
+
+@lru_cache(maxsize=256)
+def negotiate(accept_encoding):
+    """
+    Выбор сжатия по заголовку Accept-Encoding (с учётом q=0 и '*').
+    :return: 'gzip', 'deflate' или None
+    """
+    accepted = {}
+    for item in accept_encoding.split(','):
+        name, _, params = item.partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    for encoding in ('gzip', 'deflate'):
+        if accepted.get(encoding, accepted.get('*', 0.0)) > 0:
+            return encoding
+    return None
+
+
+def compress(data, encoding, level=COMPRESS_LEVEL):
+    if encoding == 'gzip':
+        # mtime=0: одинаковый результат для одинаковых данных.
+        return gzip.compress(data, level, mtime=0)
+    return zlib.compress(data, level)
+
+
+def compress_stream(chunks, encoding, level=COMPRESS_LEVEL, flush_size=STREAM_CHUNK_SIZE):
+    # Потоковое сжатие: Z_SYNC_FLUSH после каждых flush_size байт исходных данных,
+    # а не после каждого куска шаблона - иначе сжатый ответ заметно больше.
+    compressor = zlib.compressobj(level, zlib.DEFLATED, WBITS[encoding])
+    pending = 0
+    try:
+        for chunk in chunks:
+            data = chunk if isinstance(chunk, bytes) else chunk.encode('utf-8')
+            if not data:
+                continue
+            output = compressor.compress(data)
+            pending += len(data)
+            if pending >= flush_size:
+                output += compressor.flush(zlib.Z_SYNC_FLUSH)
+                pending = 0
+            if output:
+                yield output
+        yield compressor.flush()
+    finally:
+        close = getattr(chunks, 'close', None)
+        if close:
+            close()
+
+
+class Compressor:
+    """
+    Сжатие ответов gzip/deflate по Accept-Encoding.
+    Тела короче min_size не сжимаются; потоковые тела сжимаются по частям,
+    с отправкой клиенту блоками по flush_size байт исходных данных.
+    """
+
+    def __init__(self, level=COMPRESS_LEVEL, min_size=COMPRESS_MIN_SIZE, flush_size=STREAM_CHUNK_SIZE):
+        self.level = level
+        self.min_size = min_size
+        self.flush_size = flush_size
+
+    @staticmethod
+    def negotiate(request):
+        accept_encoding = request.environ.get('HTTP_ACCEPT_ENCODING')
+        return negotiate(accept_encoding) if accept_encoding else None
+
+    @staticmethod
+    def compressible(request):
+        content_type = 'text/html'
+        for name, value in request.response_headers or ():
+            lowered = name.lower()
+            if lowered == 'content-encoding':
+                return False
+            if lowered == 'content-type':
+                content_type = value
+        return content_type.startswith(COMPRESSIBLE_TYPES)
+
+    def __call__(self, request, code, body, encoding):
+        """
+        :param encoding: результат negotiate(request)
+        :return: (code, body) - тело сжато, если это возможно и выгодно
+        """
+        if code[:3] in ('204', '304') or not self.compressible(request):
+            return code, body
+        # Ответ зависит от Accept-Encoding - сообщаем об этом кэшам.
+        request.add_header('Vary', 'Accept-Encoding')
+        if encoding is None:
+            return code, body
+        if isinstance(body, (str, bytes)):
+            data = body.encode('utf-8') if isinstance(body, str) else body
+            if len(data) < self.min_size:
+                return code, data
+            request.add_header('Content-Encoding', encoding)
+            return code, compress(data, encoding, self.level)
+        request.add_header('Content-Encoding', encoding)
+        return code, compress_stream(body, encoding, self.level, self.flush_size)
@@ -1,22 +1,299 @@
+import binascii
+import re
+from http.cookies import SimpleCookie
+from tempfile import SpooledTemporaryFile
+from urllib.parse import unquote_plus
+
+from lite_framework.settings import MAX_FORM_FIELDS, MAX_FIELD_SIZE, MAX_BODY_SIZE, BODY_CHUNK_SIZE, \
+    UPLOAD_SPOOL_SIZE
+
+
+# Ошибка разбора запроса: превышены ограничения или неверные данные.
+class RequestError(Exception):
+
+    def __init__(self, message, status='400 Bad Request'):
+        super().__init__(message)
+        self.status = status
+
+
+# Словарь параметров: по ключу - последнее значение, getlist - все значения.
+class QueryDict(dict):
+
+    def __init__(self):
+        super().__init__()
+        self.lists = {}
+
+    def add(self, key, value):
+        # Список заводим только для повторяющихся ключей.
+        if key in self:
+            self.lists.setdefault(key, [self[key]]).append(value)
+        self[key] = value
+
+    def getlist(self, key):
+        if key in self.lists:
+            return list(self.lists[key])
+        return [self[key]] if key in self else []
+
+
+def unquote_value(value: str) -> str:
+    """
+    Декодирование %XX и '+' как в unquote_plus, но на C-коде binascii:
+    %XX превращаются в =XX quoted-printable, а настоящие '=' экранируются.
+    """
+    if '%' not in value:
+        return value.replace('+', ' ')
+    if '\r' in value or '\n' in value:
+        return unquote_plus(value, errors='replace')
+    try:
+        data = value.replace('=', '=3D').replace('%', '=').replace('+', ' ').encode('latin-1')
+    except UnicodeEncodeError:
+        return unquote_plus(value, errors='replace')
+    result = binascii.a2b_qp(data)
+    # Каждая верная %XX даёт один байт; если длина не сошлась - в строке битые %.
+    if len(result) != len(value) - 2 * value.count('%'):
+        return unquote_plus(value, errors='replace')
+    return result.decode('utf-8', errors='replace')
+
+
+def wsgi_to_str(value: str) -> str:
+    """
+    Строки environ по PEP 3333 - байты, прочитанные как latin-1;
+    символы вне ASCII (без %-кодирования) перечитываются как UTF-8.
+    """
+    if value.isascii():
+        return value
+    try:
+        return value.encode('latin-1').decode('utf-8', errors='replace')
+    except UnicodeEncodeError:
+        return value
+
+
+def parse_query(data: str, max_fields=MAX_FORM_FIELDS, max_field_size=MAX_FIELD_SIZE):
+    """
+    Разбор application/x-www-form-urlencoded за один проход.
+    Каждое поле декодируется один раз (%XX и '+').
+    :param data: строка параметров
+    :param max_fields: максимальное число полей
+    :param max_field_size: максимальная длина пары ключ=значение
+    :return: QueryDict
+    """
+    result = QueryDict()
+    if not data:
+        return result
+    # Делим параметры через &.
+    params = data.split('&')
+    if len(params) > max_fields:
+        raise RequestError(f'Слишком много полей: больше {max_fields}', '413 Payload Too Large')
+    if len(data) > max_field_size and max(map(len, params)) > max_field_size:
+        raise RequestError(f'Слишком длинное поле: больше {max_field_size}', '413 Payload Too Large')
+    add = result.add
+    for item in params:
+        if not item:
+            continue
+        # Делим ключ и значение по первому =.
+        k, _, v = item.partition('=')
+        if '%' in k or '+' in k:
+            k = unquote_value(k)
+        if '%' in v or '+' in v:
+            v = unquote_value(v)
+        add(k, v)
+    return result
+
+
+# Параметр заголовка: имя=значение или имя="строка в кавычках" (внутри кавычек ';' - часть значения).
+HEADER_PARAM_RE = re.compile(r';\s*([^\s;=]+)\s*(?:=\s*("(?:[^"\\]|\\.)*"?|[^;]*))?')
+QUOTED_PAIR_RE = re.compile(r'\\([\\"])')
+
+
+def parse_header(value: str):
+    """
+    Разбор заголовка вида 'multipart/form-data; boundary="abc"'.
+    :return: (основное значение, словарь параметров)
+    """
+    main, separator, rest = value.partition(';')
+    params = {}
+    for match in HEADER_PARAM_RE.finditer(separator + rest):
+        key, param = match.group(1), (match.group(2) or '').strip()
+        if param.startswith('"'):
+            param = QUOTED_PAIR_RE.sub(r'\1', param[1:-1] if len(param) > 1 and param.endswith('"') else param[1:])
+        params[key.lower()] = param
+    return main.strip().lower(), params
+
+
+def iter_body(environ, max_size=MAX_BODY_SIZE, chunk_size=BODY_CHUNK_SIZE):
+    """
+    Читает тело запроса блоками, не больше max_size байт.
+    :param environ: WSGI environ
+    :return: генератор блоков bytes
+    """
+    content_length_data = environ.get('CONTENT_LENGTH')
+    content_length = int(content_length_data) if content_length_data and content_length_data.isdigit() else 0
+    if content_length > max_size:
+        raise RequestError(f'Тело запроса больше {max_size} байт', '413 Payload Too Large')
+    stream = environ['wsgi.input']
+    remaining = content_length
+    while remaining > 0:
+        data = stream.read(min(chunk_size, remaining))
+        if not data:
+            break
+        remaining -= len(data)
+        yield data
+
+
+# Загруженный файл из multipart/form-data.
+# Содержимое в памяти до UPLOAD_SPOOL_SIZE байт, дальше - во временном файле.
+class UploadedFile:
+
+    def __init__(self, filename, content_type, spool_size=UPLOAD_SPOOL_SIZE):
+        self.filename = filename
+        self.content_type = content_type
+        self.size = 0
+        self.file = SpooledTemporaryFile(max_size=spool_size)
+
+    def write(self, data):
+        self.size += len(data)
+        self.file.write(data)
+
+    def read(self, size=-1):
+        return self.file.read(size)
+
+    def seek(self, offset, whence=0):
+        return self.file.seek(offset, whence)
+
+    def close(self):
+        self.file.close()
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({self.filename!r}, {self.content_type!r}, size={self.size})'
+
+
+class MultipartParser:
+    """
+    Потоковый разбор multipart/form-data: данные подаются блоками через feed().
+    Обычные поля попадают в QueryDict строками, файлы - объектами UploadedFile.
+    """
+
+    def __init__(self, boundary: bytes, max_fields=MAX_FORM_FIELDS, max_field_size=MAX_FIELD_SIZE,
+                 spool_size=UPLOAD_SPOOL_SIZE):
+        self.delimiter = b'\r\n--' + boundary
+        self.max_fields = max_fields
+        self.max_field_size = max_field_size
+        self.spool_size = spool_size
+        self.result = QueryDict()
+        # Первой границе не предшествует перевод строки - добавляем его.
+        self.buffer = b'\r\n'
+        self.state = 'preamble'
+        self.fields = 0
+        self.name = None
+        self.part = None
+
+    def feed(self, data: bytes):
+        self.buffer += data
+        while self._step():
+            pass
+
+    def close(self):
+        if self.state != 'end':
+            raise RequestError('Оборванное тело multipart/form-data')
+        return self.result
+
+    def _step(self):
+        if self.state == 'preamble':
+            position = self.buffer.find(self.delimiter)
+            if position < 0:
+                self.buffer = self.buffer[-len(self.delimiter):]
+                return False
+            self.buffer = self.buffer[position + len(self.delimiter):]
+            self.state = 'delimiter'
+            return True
+
+        if self.state == 'delimiter':
+            if len(self.buffer) < 2:
+                return False
+            if self.buffer.startswith(b'--'):
+                self.state = 'end'
+                self.buffer = b''
+                return False
+            if not self.buffer.startswith(b'\r\n'):
+                raise RequestError('Неверная граница multipart/form-data')
+            self.buffer = self.buffer[2:]
+            self.state = 'headers'
+            return True
+
+        if self.state == 'headers':
+            position = self.buffer.find(b'\r\n\r\n')
+            if position < 0:
+                if len(self.buffer) > 16384:
+                    raise RequestError('Слишком длинные заголовки части', '413 Payload Too Large')
+                return False
+            self._start_part(self.buffer[:position].decode('utf-8', errors='replace'))
+            self.buffer = self.buffer[position + 4:]
+            self.state = 'body'
+            return True
+
+        if self.state == 'body':
+            position = self.buffer.find(self.delimiter)
+            if position < 0:
+                # Хвост может оказаться началом границы - оставляем его в буфере.
+                keep = len(self.delimiter) - 1
+                if len(self.buffer) > keep:
+                    self._write(self.buffer[:-keep])
+                    self.buffer = self.buffer[-keep:]
+                return False
+            self._write(self.buffer[:position])
+            self._finish_part()
+            self.buffer = self.buffer[position + len(self.delimiter):]
+            self.state = 'delimiter'
+            return True
+
+        return False
+
+    def _start_part(self, head):
+        self.fields += 1
+        if self.fields > self.max_fields:
+            raise RequestError(f'Слишком много полей: больше {self.max_fields}', '413 Payload Too Large')
+        headers = {}
+        for line in head.split('\r\n'):
+            key, _, value = line.partition(':')
+            headers[key.strip().lower()] = value.strip()
+        _, params = parse_header(headers.get('content-disposition', ''))
+        self.name = params.get('name', '')
+        if 'filename' in params:
+            self.part = UploadedFile(params['filename'], headers.get('content-type', 'application/octet-stream'),
+                                     self.spool_size)
+        else:
+            self.part = bytearray()
+
+    def _write(self, data):
+        if not data:
+            return
+        if isinstance(self.part, bytearray) and len(self.part) + len(data) > self.max_field_size:
+            raise RequestError(f'Слишком длинное поле: больше {self.max_field_size}', '413 Payload Too Large')
+        if isinstance(self.part, bytearray):
+            self.part += data
+        else:
+            self.part.write(data)
+
+    def _finish_part(self):
+        if isinstance(self.part, bytearray):
+            self.result.add(self.name, self.part.decode('utf-8', errors='replace'))
+        else:
+            self.part.seek(0)
+            self.result.add(self.name, self.part)
+        self.part = None
+
+
 # Обработка GET-запроса.
 class GetRequests:
 
     @staticmethod
     def parse_input_data(data: str):
-        result = {}
-        if data:
-            # Делим параметры через &.
-            params = data.split('&')
-            for item in params:
-                # Делим ключ и значение через =.
-                k, v = item.split('=')
-                result[k] = v
-        return result
+        return parse_query(data)
 
     @staticmethod
     def get_request_params(environ):
         # Получаем параметры запроса.
-        query_string = environ['QUERY_STRING']
+        query_string = wsgi_to_str(environ.get('QUERY_STRING', ''))
         # Превращаем параметры в словарь.
         request_params = GetRequests.parse_input_data(query_string)
         return request_params
@@ -27,39 +304,146 @@ class PostRequests:
 
     @staticmethod
     def parse_input_data(data: str):
-        result = {}
-        if data:
-            # Делим параметры через &.
-            params = data.split('&')
-            for item in params:
-                # Делим ключ и значение через =.
-                k, v = item.split('=')
-                result[k] = v
-        return result
+        return parse_query(data)
 
     @staticmethod
     def get_wsgi_input_data(env) -> bytes:
-        # Получаем длину тела.
-        content_length_data = env.get('CONTENT_LENGTH')
-        # Приводим к int.
-        content_length = int(content_length_data) if content_length_data else 0
-        # Считываем данные, если они есть.
-        data = env['wsgi.input'].read(
-            content_length) if content_length > 0 else b''
-        return data
+        # Считываем тело целиком, но не больше MAX_BODY_SIZE.
+        return b''.join(iter_body(env))
+
+    @staticmethod
+    def parse_multipart(env, boundary) -> dict:
+        # Тело разбирается по мере чтения, файлы не держатся в памяти целиком.
+        parser = MultipartParser(boundary.encode('latin-1'))
+        for chunk in iter_body(env):
+            parser.feed(chunk)
+        return parser.close()
 
     def parse_wsgi_input_data(self, data: bytes) -> dict:
-        result = {}
+        result = QueryDict()
         if data:
-            # Декодируем данные.
-            data_str = data.decode(encoding='utf-8')
+            # Декодируем данные: символы вне ASCII браузер присылает в UTF-8.
+            data_str = data.decode(encoding='utf-8', errors='replace')
             # Собираем их в словарь.
             result = self.parse_input_data(data_str)
         return result
 
     def get_request_params(self, environ):
+        content_type, params = parse_header(environ.get('CONTENT_TYPE', ''))
+        if content_type == 'multipart/form-data':
+            if not params.get('boundary'):
+                raise RequestError('Нет границы multipart/form-data')
+            return self.parse_multipart(environ, params['boundary'])
         # Получаем данные.
         data = self.get_wsgi_input_data(environ)
         # Превращаем данные в словарь.
         data = self.parse_wsgi_input_data(data)
         return data
+
+
+class Request:
+    """
+    Запрос, разбираемый лениво: параметры, тело, заголовки и cookies
+    вычисляются при первом обращении и запоминаются.
+    Поддерживает доступ как к словарю: request['data'], request['method'].
+    """
+
+    __slots__ = ('environ', 'method', 'response_headers', '_values')
+
+    def __init__(self, environ):
+        self.environ = environ
+        self.method = environ['REQUEST_METHOD']
+        # Заголовки ответа, добавленные контроллером или front controller.
+        self.response_headers = None
+        self._values = {}
+
+    def add_header(self, name, value):
+        if self.response_headers is None:
+            self.response_headers = []
+        self.response_headers.append((name, value))
+
+    def load_data(self):
+        if self.method != 'POST':
+            raise KeyError('data')
+        return PostRequests().get_request_params(self.environ)
+
+    def load_request_params(self):
+        if self.method != 'GET':
+            raise KeyError('request_params')
+        return GetRequests().get_request_params(self.environ)
+
+    def load_headers(self):
+        headers = {}
+        for key, value in self.environ.items():
+            if key.startswith('HTTP_'):
+                headers[key[5:].replace('_', '-').title()] = value
+        for key in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            if self.environ.get(key):
+                headers[key.replace('_', '-').title()] = self.environ[key]
+        return headers
+
+    def load_cookies(self):
+        cookie = SimpleCookie()
+        cookie.load(self.environ.get('HTTP_COOKIE', ''))
+        return {key: morsel.value for key, morsel in cookie.items()}
+
+    # Ленивые ключи: ключ -> функция вычисления.
+    loaders = {
+        'data': load_data,
+        'request_params': load_request_params,
+        'headers': load_headers,
+        'cookies': load_cookies,
+    }
+
+    @property
+    def data(self):
+        return self['data']
+
+    @property
+    def request_params(self):
+        return self['request_params']
+
+    @property
+    def headers(self):
+        return self['headers']
+
+    @property
+    def cookies(self):
+        return self['cookies']
+
+    def __getitem__(self, key):
+        if key == 'method':
+            return self.method
+        try:
+            return self._values[key]
+        except KeyError:
+            loader = self.loaders.get(key)
+            if loader is None:
+                raise
+        value = self._values[key] = loader(self)
+        return value
+
+    def __setitem__(self, key, value):
+        if key == 'method':
+            self.method = value
+        else:
+            self._values[key] = value
+
+    def __delitem__(self, key):
+        del self._values[key]
+
+    def __contains__(self, key):
+        try:
+            self[key]
+        except KeyError:
+            return False
+        return True
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__} {self.method} {self.environ.get("PATH_INFO", "")}>'
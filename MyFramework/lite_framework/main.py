@@ -1,72 +1,164 @@
-import quopri
+import asyncio
+import codecs
+import inspect
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
 
-from lite_framework.lite_requests import PostRequests, GetRequests
-from patterns.сreational_patterns import Note
+from lite_framework.cache import response_cache
+from lite_framework.compression import Compressor
+from lite_framework.lite_requests import Request, RequestError
+from lite_framework.middleware import Chain, select_fronts
+from lite_framework.router import Router
+from lite_framework.settings import STREAM_CHUNK_SIZE, ASGI_THREADS, MAX_BODY_SIZE, COMPRESS_ENABLED
+from patterns.сreational_patterns import Note, Logger
+
+# Значение по умолчанию, отличное от None (None - явный отказ).
+DEFAULT = object()
+
+# Функции, которые выполняются при остановке приложения (например, досылка уведомлений).
+shutdown_hooks = []
+
+
+def on_shutdown(func):
+    shutdown_hooks.append(func)
+    return func
+
+
+class NoteRequest(Request):
+    """Запрос, в котором заметка из POST-данных (name, description, category) тоже вычисляется лениво."""
+
+    __slots__ = ()
+
+    def load_note(self):
+        data = self['data']
+        name = data.get('name', None)
+        description = data.get('description', None)
+        category = data.get('category', None)
+        if not (name and description and category):
+            raise KeyError('note')
+        return Note(name=name, description=description, category=category)
+
+    loaders = dict(Request.loaders, note=load_note)
 
 
 class LiteFramework:
     """Класс Framework - основа фреймворка"""
 
-    def __init__(self, routes_obj, fronts_obj):
+    def __init__(self, routes_obj, fronts_obj, cache=response_cache, compressor=DEFAULT):
         self.routes_lst = routes_obj
         self.fronts_lst = fronts_obj
+        # Кэш страниц для контроллеров с cache_page = True.
+        self.cache = cache
+        # Сжатие ответов (None - без сжатия).
+        self.compressor = (Compressor() if COMPRESS_ENABLED else None) if compressor is DEFAULT else compressor
+        # Цепочки front controllers и маршруты компилируются один раз.
+        chains = {}
+        self.router = Router({url: self.get_chain(chains, view) for url, view in routes_obj.items()})
+        self.not_found = self.get_chain(chains, PageNotFound404())
 
     def __call__(self, environ, start_response):
-        # Получаем адрес, по которому выполнен переход.
-        path = environ['PATH_INFO']
+        try:
+            request = self.get_request(environ)
+            chain, request['path_params'] = self.get_view(environ['PATH_INFO'])
 
-        # Добавление закрывающего слеша.
-        if not path.endswith('/'):
-            path = f'{path}/'
+            # Наполняем словарь request элементами
+            # этот словарь получат все контроллеры
+            # отработка паттерна front controller.
+            # Запуск контроллера с передачей объекта request.
+            code, body = chain(request)
+        except RequestError as error:
+            # Тело разбирается лениво, ошибка разбора приходит из front controller или контроллера.
+            result = [str(error).encode('utf-8')]
+            start_response(error.status, LiteFramework.get_headers(result))
+            return result
+        if code.startswith('304'):
+            # У 304 нет тела: только валидаторы, без Content-Type и Content-Length.
+            start_response(code, request.response_headers or [])
+            return []
+        result = LiteFramework.encode_body(body)
+        start_response(code, LiteFramework.get_headers(result, request.response_headers))
+        return result
 
-        request = {}
-        # Данные запроса.
-        method = environ['REQUEST_METHOD']
-        request['method'] = method
-
-        if method == 'POST':
-            data = PostRequests().get_request_params(environ)
-            request['data'] = data
-
-            name = data.get('name', None)
-            description = data.get('description', None)
-            category = data.get('category', None)
+    @staticmethod
+    def close():
+        # Сервер вызывает при остановке явно: процесс-потомок завершается через os._exit, без atexit.
+        for hook in shutdown_hooks:
+            hook()
 
-            if name and description and category:
-                request['note'] = Note(name=name, description=description, category=category)
+    @staticmethod
+    def get_headers(result, extra=None):
+        """
+        :param result: тело ответа (список - длина известна заранее)
+        :param extra: заголовки от контроллера; свой Content-Type заменяет text/html
+        """
+        if extra:
+            headers = list(extra)
+            if not any(name.lower() == 'content-type' for name, value in headers):
+                headers.insert(0, ('Content-Type', 'text/html'))
+        else:
+            headers = [('Content-Type', 'text/html')]
+        if isinstance(result, list):
+            headers.append(('Content-Length', str(sum(len(data) for data in result))))
+        return headers
 
-            print(f'Пришёл post-запрос: {LiteFramework.decode_value(data)}')
-        if method == 'GET':
-            request_params = GetRequests().get_request_params(environ)
-            request['request_params'] = request_params
-            print(f'Пришли GET-параметры: {request_params}')
-        print(request)
+    @staticmethod
+    def get_request(environ):
+        # Запрос ничего не разбирает, пока контроллер не обратится к данным.
+        return NoteRequest(environ)
 
+    def get_view(self, path):
         # Находим нужный контроллер
         # отработка паттерна page controller
-        if path in self.routes_lst:
-            view = self.routes_lst[path]
-        else:
-            view = PageNotFound404()
-
-        # Наполняем словарь request элементами
-        # этот словарь получат все контроллеры
-        # отработка паттерна front controller.
-        for front in self.fronts_lst:
-            front(request)
-        # Запуск контроллера с передачей объекта request.
-        code, body = view(request)
-        start_response(code, [('Content-Type', 'text/html')])
-        return [body.encode('utf-8')]
+        chain, params = self.router.match(path)
+        if chain is None:
+            return self.not_found, {}
+        return chain, params
+
+    def get_chain(self, chains, view):
+        # Одна цепочка на объект контроллера (общий для нескольких адресов).
+        if id(view) not in chains:
+            chains[id(view)] = Chain(view, select_fronts(view, self.fronts_lst), self.cache, self.compressor)
+        return chains[id(view)]
+
+    @staticmethod
+    def encode_body(body):
+        """
+        Тело ответа в виде WSGI-итерируемого.
+        :param body: str, bytes или итерируемое из str/bytes (например, Template.generate())
+        :return: итерируемое из bytes
+        """
+        if isinstance(body, str):
+            return [body.encode('utf-8')]
+        if isinstance(body, bytes):
+            return [body]
+        return LiteFramework.iter_encoded(body)
 
     @staticmethod
-    def decode_value(data):
-        new_data = {}
-        for k, v in data.items():
-            val = bytes(v.replace('%', '=').replace("+", " "), 'UTF-8')
-            val_decode_str = quopri.decodestring(val).decode('UTF-8')
-            new_data[k] = val_decode_str
-        return new_data
+    def iter_encoded(chunks, chunk_size=STREAM_CHUNK_SIZE):
+        # Кодируем по частям и склеиваем мелкие куски в блоки около chunk_size байт.
+        encoder = codecs.getincrementalencoder('utf-8')()
+        buffer = []
+        size = 0
+        try:
+            for chunk in chunks:
+                data = chunk if isinstance(chunk, bytes) else encoder.encode(chunk)
+                if not data:
+                    continue
+                buffer.append(data)
+                size += len(data)
+                if size >= chunk_size:
+                    yield b''.join(buffer)
+                    buffer = []
+                    size = 0
+            data = encoder.encode('', final=True)
+            if data:
+                buffer.append(data)
+            if buffer:
+                yield b''.join(buffer)
+        finally:
+            close = getattr(chunks, 'close', None)
+            if close:
+                close()
 
 
 # Новый вид WSGI-application.
@@ -76,12 +168,13 @@ class LiteFramework:
 class DebugApplication(LiteFramework):
 
     def __init__(self, routes_obj, fronts_obj):
-        self.application = Framework(routes_obj, fronts_obj)
+        self.application = LiteFramework(routes_obj, fronts_obj)
+        self.logger = Logger('debug')
         super().__init__(routes_obj, fronts_obj)
 
     def __call__(self, env, start_response):
-        print('DEBUG MODE')
-        print(env)
+        self.logger.info('%s %s?%s', env['REQUEST_METHOD'], env['PATH_INFO'], env.get('QUERY_STRING', ''))
+        self.logger.debug('%s', env)
         return self.application(env, start_response)
 
 
@@ -99,6 +192,152 @@ class FakeApplication(LiteFramework):
         return [b'Hello from Fake']
 
 
+# ASGI-приложение: те же маршруты, front controllers и контроллеры.
+# Контроллеры и front controllers могут быть async def,
+# синхронные контроллеры выполняются в ограниченном пуле потоков.
+class AsgiApplication(LiteFramework):
+
+    def __init__(self, routes_obj, fronts_obj, threads=ASGI_THREADS):
+        super().__init__(routes_obj, fronts_obj)
+        self.executor = ThreadPoolExecutor(threads)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+
+        try:
+            body = await self.read_body(receive)
+            environ = self.get_environ(scope, body)
+            request = self.get_request(environ)
+            chain, request['path_params'] = self.get_view(environ['PATH_INFO'])
+            code, body = await self.call_chain(chain, request)
+        except RequestError as error:
+            await self.send_body(send, error.status, str(error))
+            return
+        await self.send_body(send, code, body, request.response_headers)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=True)
+                self.close()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    @staticmethod
+    async def read_body(receive, max_size=MAX_BODY_SIZE):
+        chunks = []
+        size = 0
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                break
+            chunk = message.get('body', b'')
+            size += len(chunk)
+            if size > max_size:
+                raise RequestError(f'Тело запроса больше {max_size} байт', '413 Payload Too Large')
+            chunks.append(chunk)
+            if not message.get('more_body', False):
+                break
+        return b''.join(chunks)
+
+    @staticmethod
+    def get_environ(scope, body):
+        # WSGI-совместимый environ, чтобы разбор запроса был общим.
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'PATH_INFO': scope['path'],
+            'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.input': BytesIO(body),
+        }
+        for name, value in scope.get('headers', []):
+            name = name.decode('latin-1').upper().replace('-', '_')
+            if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+                name = f'HTTP_{name}'
+            environ[name] = value.decode('latin-1')
+        environ['CONTENT_LENGTH'] = str(len(body))
+        return environ
+
+    async def call_chain(self, chain, request):
+        # Та же цепочка, что и в WSGI, но хуки могут быть async def.
+        for hook in chain.before:
+            result = hook(request)
+            if inspect.isawaitable(result):
+                result = await result
+            if result is not None:
+                return result
+        encoding = chain.negotiate(request)
+        result, key = chain.lookup(request, encoding)
+        if result is not None:
+            return result
+        code, body = await self.call_view(chain.view, request)
+        for hook in chain.after:
+            result = hook(request, code, body)
+            if inspect.isawaitable(result):
+                result = await result
+            code, body = result
+        if hasattr(body, '__aiter__'):
+            return code, body
+        # Сжатие и сборка тела для кэша (рендеринг шаблона) - в пуле потоков.
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, chain.finish, request, code, body, encoding, key)
+
+    async def call_view(self, view, request):
+        if inspect.iscoroutinefunction(view) or inspect.iscoroutinefunction(getattr(view, '__call__', None)):
+            return await view(request)
+        result = await asyncio.get_running_loop().run_in_executor(self.executor, view, request)
+        if inspect.isawaitable(result):
+            result = await result
+        return result
+
+    async def send_body(self, send, code, body, extra=None):
+        status = int(code.split(' ', 1)[0])
+        if status == 304:
+            await self.send_start(send, status, extra or [])
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+        if hasattr(body, '__aiter__'):
+            await self.send_start(send, status, self.get_headers(None, extra))
+            async for chunk in body:
+                data = chunk if isinstance(chunk, bytes) else chunk.encode('utf-8')
+                if data:
+                    await send({'type': 'http.response.body', 'body': data, 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+
+        result = self.encode_body(body)
+        await self.send_start(send, status, self.get_headers(result, extra))
+        if isinstance(result, list):
+            await send({'type': 'http.response.body', 'body': b''.join(result)})
+            return
+        # Синхронный генератор (например, Template.generate()) читаем в пуле потоков.
+        loop = asyncio.get_running_loop()
+        while True:
+            data = await loop.run_in_executor(self.executor, next, result, None)
+            if data is None:
+                break
+            await send({'type': 'http.response.body', 'body': data, 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b''})
+
+    @staticmethod
+    async def send_start(send, status, headers):
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers],
+        })
+
+
 class PageNotFound404:
+    # Для 404 front controllers не выполняются.
+    fronts = ()
+
     def __call__(self, request):
         return '404 WHAT', '404 PAGE Not Found'
@@ -0,0 +1,245 @@
+import math
+import os
+import threading
+from email.utils import formatdate, parsedate_to_datetime
+from time import monotonic, time
+
+from lite_framework.cache import cache_key
+
+# Заголовки, которые вычисляются заново для каждого запроса и в кэш не попадают.
+VALIDATOR_HEADERS = ('ETag', 'Last-Modified', 'Cache-Control')
+
+# Метка процесса в ETag: после перезапуска номера изменений начинаются заново.
+BOOT_ID = os.urandom(4).hex()
+
+
+def _new_boot_id():
+    # У процесса после fork свои счётчики - и своя метка.
+    global BOOT_ID
+    BOOT_ID = os.urandom(4).hex()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_new_boot_id)
+
+
+class TimedValue:
+    """
+    Значение, которое вычисляется не чаще одного раза за ttl секунд.
+    Front controller хранит в нём то, что одинаково для всех запросов окна.
+    """
+
+    __slots__ = ('func', 'ttl', 'value', 'expires', 'lock')
+
+    def __init__(self, func, ttl):
+        self.func = func
+        self.ttl = ttl
+        self.value = None
+        self.expires = 0.0
+        self.lock = threading.Lock()
+
+    def __call__(self):
+        now = monotonic()
+        if now >= self.expires:
+            with self.lock:
+                if now >= self.expires:
+                    self.value = self.func()
+                    self.expires = now + self.ttl
+        return self.value
+
+
+def cached_value(ttl):
+    """
+    Декоратор кэшируемого значения front controller.
+    :param ttl: окно времени, секунд
+    """
+    def decorator(func):
+        return TimedValue(func, ttl)
+    return decorator
+
+
+def front_name(front):
+    return getattr(front, 'name', None) or getattr(front, '__name__', None) or type(front).__name__
+
+
+def get_hooks(front):
+    """
+    Хуки front controller.
+    Функция - хук до контроллера. Объект может задать before(request)
+    и/или after(request, code, body) -> (code, body).
+    :return: (before или None, after или None)
+    """
+    before = getattr(front, 'before', None)
+    after = getattr(front, 'after', None)
+    if before is None and after is None:
+        return front, None
+    return before, after
+
+
+def select_fronts(view, fronts):
+    """
+    Front controllers маршрута.
+    Атрибут fronts контроллера - явный список (() - без front controllers),
+    exclude_fronts - исключения из общего списка. Задаются объектом или именем.
+    """
+    selected = getattr(view, 'fronts', None)
+    if selected is None:
+        selected = fronts
+    excluded = getattr(view, 'exclude_fronts', ())
+    if excluded:
+        names = {item for item in excluded if isinstance(item, str)}
+        selected = [front for front in selected
+                    if front not in excluded and front_name(front) not in names]
+    return list(selected)
+
+
+def to_bytes(body):
+    # Тело ответа целиком: str, bytes или итерируемое из них (например, Template.generate()).
+    if isinstance(body, str):
+        return body.encode('utf-8')
+    if isinstance(body, bytes):
+        return body
+    try:
+        return b''.join(chunk if isinstance(chunk, bytes) else chunk.encode('utf-8') for chunk in body)
+    finally:
+        close = getattr(body, 'close', None)
+        if close:
+            close()
+
+
+def matches_etag(header, etag):
+    # If-None-Match: список ETag через запятую или '*', слабое сравнение.
+    if header.strip() == '*':
+        return True
+    etag = etag[2:] if etag.startswith('W/') else etag
+    for item in header.split(','):
+        item = item.strip()
+        if (item[2:] if item.startswith('W/') else item) == etag:
+            return True
+    return False
+
+
+def not_modified_since(header, modified):
+    # Время изменения с долями секунды: Last-Modified округлён вверх, поэтому совпадение - не раньше.
+    try:
+        return modified <= parsedate_to_datetime(header).timestamp()
+    except (TypeError, ValueError, IndexError):
+        return False
+
+
+def conditional_response(request, version):
+    """
+    Условный GET: добавляет ETag и Last-Modified и, если клиент
+    прислал совпадающие валидаторы, сразу отвечает 304.
+    :param version: (номер изменения, время изменения) или None
+    :return: ('304 Not Modified', '') или None
+    """
+    if version is None:
+        return None
+    number, modified = version
+    etag = f'W/"{BOOT_ID}-{number}"'
+    request.add_header('ETag', etag)
+    # Заголовок точен до секунды: пока секунда изменения не закончилась, в ней возможны
+    # новые изменения с тем же Last-Modified - до тех пор клиент проверяет ответ по ETag.
+    last_modified = math.ceil(modified)
+    if last_modified <= time():
+        request.add_header('Last-Modified', formatdate(last_modified, usegmt=True))
+    # Браузер хранит ответ, но каждый раз спрашивает, не изменился ли он.
+    request.add_header('Cache-Control', 'no-cache')
+    environ = request.environ
+    if_none_match = environ.get('HTTP_IF_NONE_MATCH')
+    if if_none_match is not None:
+        not_modified = matches_etag(if_none_match, etag)
+    else:
+        if_modified_since = environ.get('HTTP_IF_MODIFIED_SINCE')
+        not_modified = if_modified_since is not None and not_modified_since(if_modified_since, modified)
+    if not_modified:
+        return '304 Not Modified', ''
+    return None
+
+
+class Chain:
+    """
+    Цепочка front controllers маршрута, собранная один раз при старте.
+    Хук before может вернуть (code, body) - тогда контроллер не вызывается.
+    Хуки after выполняются в обратном порядке.
+    Если у контроллера есть метод validators(request), возвращающий
+    (номер изменения, время), GET и HEAD получают ETag/Last-Modified,
+    а повторный запрос без изменений - 304 до вызова контроллера.
+    Контроллер с cache_page = True кэширует страницу, пока номер не изменится.
+    Ответ сжимается compressor (если контроллер не задал compress = False);
+    в кэше варианты с разным сжатием хранятся рядом, каждый сжат один раз.
+    """
+
+    __slots__ = ('view', 'before', 'after', 'validators', 'cache', 'compressor')
+
+    def __init__(self, view, fronts, cache=None, compressor=None):
+        self.view = view
+        hooks = [get_hooks(front) for front in fronts]
+        self.before = tuple(before for before, after in hooks if before is not None)
+        self.after = tuple(after for before, after in reversed(hooks) if after is not None)
+        self.validators = getattr(view, 'validators', None)
+        self.cache = cache if self.validators is not None and getattr(view, 'cache_page', False) else None
+        self.compressor = compressor if getattr(view, 'compress', True) else None
+
+    def negotiate(self, request):
+        return self.compressor.negotiate(request) if self.compressor is not None else None
+
+    def lookup(self, request, encoding=None):
+        """
+        Проверки до вызова контроллера: условный GET и кэш страниц.
+        :param encoding: выбранное сжатие - часть ключа кэша
+        :return: (готовый ответ или None, ключ для сохранения в кэш или None)
+        """
+        if self.validators is None or request.method not in ('GET', 'HEAD'):
+            return None, None
+        version = self.validators(request)
+        result = conditional_response(request, version)
+        if result is not None and self.compressor is not None:
+            # 304 повторяет Vary ответа 200, иначе кэш не узнает, что ответ зависит от сжатия.
+            request.add_header('Vary', 'Accept-Encoding')
+        if result is not None or self.cache is None or version is None:
+            return result, None
+        key = ((cache_key(request), encoding), version[0])
+        entry = self.cache.get(*key)
+        if entry is None:
+            return None, key
+        headers, body = entry
+        for name, value in headers:
+            request.add_header(name, value)
+        return ('200 OK', body), None
+
+    def store(self, request, key, code, body):
+        # Сохраняем только успешный ответ; тело собирается в bytes.
+        if not code.startswith('200'):
+            return code, body
+        body = to_bytes(body)
+        headers = [(name, value) for name, value in request.response_headers or ()
+                   if name not in VALIDATOR_HEADERS]
+        self.cache.set(key[0], key[1], headers, body)
+        return code, body
+
+    def finish(self, request, code, body, encoding, key):
+        # После хуков after: сжатие и сохранение в кэш уже окончательного ответа.
+        if key is not None and code.startswith('200'):
+            # Ответ пойдёт в кэш: собираем тело целиком и сжимаем за один проход.
+            body = to_bytes(body)
+        if self.compressor is not None:
+            code, body = self.compressor(request, code, body, encoding)
+        if key is not None:
+            code, body = self.store(request, key, code, body)
+        return code, body
+
+    def __call__(self, request):
+        for hook in self.before:
+            result = hook(request)
+            if result is not None:
+                return result
+        encoding = self.negotiate(request)
+        result, key = self.lookup(request, encoding)
+        if result is not None:
+            return result
+        code, body = self.view(request)
+        for hook in self.after:
+            code, body = hook(request, code, body)
+        return self.finish(request, code, body, encoding, key)
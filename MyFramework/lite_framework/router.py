@@ -0,0 +1,121 @@
+import re
+
+# Типы параметров пути: шаблон сегмента и преобразование значения.
+CONVERTERS = {
+    'int': (re.compile(r'\d+'), int),
+    'str': (re.compile(r'[^/]+'), str),
+    'slug': (re.compile(r'[-\w]+'), str),
+}
+
+PARAM_RE = re.compile(r'^<(?:(?P<type>\w+):)?(?P<name>\w+)>$')
+
+
+class MethodNotAllowed:
+    def __call__(self, request):
+        return '405 Method Not Allowed', '405 Method Not Allowed'
+
+
+# Маршрут с ограничением по HTTP-методам.
+class MethodDispatch:
+
+    def __init__(self):
+        self.views = {}
+
+    def add(self, methods, view):
+        for method in methods:
+            self.views[method.upper()] = view
+
+    def __call__(self, request):
+        view = self.views.get(request['method'], MethodNotAllowed())
+        return view(request)
+
+
+class _Node:
+    __slots__ = ('children', 'params', 'view')
+
+    def __init__(self):
+        # Статические сегменты: сегмент -> узел.
+        self.children = {}
+        # Параметры: (имя, шаблон, преобразование, узел).
+        self.params = []
+        self.view = None
+
+
+class Router:
+    """
+    Маршрутизатор, собранный один раз при старте из словаря routes.
+    Статические адреса ищутся в словаре, адреса с параметрами
+    (например, '/note/<int:id>/') - в дереве по сегментам,
+    поэтому стоимость поиска не зависит от числа маршрутов.
+    """
+
+    def __init__(self, routes):
+        self.static = {}
+        self.root = _Node()
+        for url, view in routes.items():
+            self.add(url, view)
+
+    @staticmethod
+    def normalize(path):
+        # Добавление закрывающего слеша.
+        return path if path.endswith('/') else f'{path}/'
+
+    @staticmethod
+    def segments(path):
+        return [segment for segment in path.split('/') if segment]
+
+    def add(self, url, view):
+        url = self.normalize(url)
+        if '<' not in url:
+            self.static[url] = view
+            return
+        node = self.root
+        for segment in self.segments(url):
+            param = PARAM_RE.match(segment)
+            if param is None:
+                node = node.children.setdefault(segment, _Node())
+                continue
+            type_ = param.group('type') or 'str'
+            if type_ not in CONVERTERS:
+                raise ValueError(f'Неизвестный тип параметра: {type_} в {url}')
+            pattern, convert = CONVERTERS[type_]
+            for name, existing, _, child in node.params:
+                if name == param.group('name') and existing is pattern:
+                    node = child
+                    break
+            else:
+                child = _Node()
+                node.params.append((param.group('name'), pattern, convert, child))
+                node = child
+        node.view = view
+
+    def match(self, path):
+        """
+        :param path: адрес запроса
+        :return: (контроллер или None, параметры пути)
+        """
+        path = self.normalize(path)
+        view = self.static.get(path)
+        if view is not None:
+            return view, {}
+        params = {}
+        view = self._match(self.root, self.segments(path), 0, params)
+        return view, params
+
+    def _match(self, node, segments, position, params):
+        if position == len(segments):
+            return node.view
+        segment = segments[position]
+        child = node.children.get(segment)
+        if child is not None:
+            view = self._match(child, segments, position + 1, params)
+            if view is not None:
+                return view
+        for name, pattern, convert, child in node.params:
+            if pattern.fullmatch(segment):
+                params[name] = convert(segment)
+                view = self._match(child, segments, position + 1, params)
+                if view is not None:
+                    return view
+                del params[name]
+        return None
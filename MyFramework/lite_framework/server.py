@@ -0,0 +1,319 @@
+import queue
+import signal
+import socket
+import socketserver
+import sys
+import threading
+import traceback
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import unquote
+
+from lite_framework.settings import SERVER_THREADS, SERVER_QUEUE_SIZE, KEEP_ALIVE_TIMEOUT, \
+    SHUTDOWN_TIMEOUT, MAX_DRAIN_SIZE
+from patterns.сreational_patterns import Logger
+
+logger = Logger('server')
+
+
+# Тело запроса, ограниченное Content-Length: приложение не прочитает следующий запрос соединения.
+class LimitedInput:
+
+    def __init__(self, stream, length):
+        self.stream = stream
+        self.remaining = length
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.stream.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def readline(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.stream.readline(size)
+        self.remaining -= len(data)
+        return data
+
+    def __iter__(self):
+        while True:
+            line = self.readline()
+            if not line:
+                return
+            yield line
+
+    def drain(self):
+        # Дочитываем то, что приложение не прочитало (остаток не больше MAX_DRAIN_SIZE).
+        while self.read(65536):
+            pass
+
+
+class WSGIRequestHandler(BaseHTTPRequestHandler):
+    """Обработчик HTTP/1.1 с keep-alive, Content-Length и chunked-ответами."""
+
+    protocol_version = 'HTTP/1.1'
+    server_version = 'LiteFramework/1.0'
+
+    def setup(self):
+        # Тайм-аут простоя keep-alive соединения.
+        self.timeout = self.server.keep_alive_timeout
+        super().setup()
+
+    def handle_one_request(self):
+        try:
+            self.raw_requestline = self.rfile.readline(65537)
+            if len(self.raw_requestline) > 65536:
+                self.send_error(414)
+                return
+            if not self.raw_requestline:
+                self.close_connection = True
+                return
+            if not self.parse_request() or not self.parse_content_length():
+                return
+            self.run_wsgi()
+            self.wfile.flush()
+        except (TimeoutError, ConnectionError):
+            self.close_connection = True
+        if self.server.draining:
+            self.close_connection = True
+
+    def parse_content_length(self):
+        """
+        Проверка заголовков тела: тело принимается только с Content-Length.
+        Иначе границу тела сервер и прокси могут понять по-разному, поэтому
+        ошибка отправляется с закрытием соединения.
+        :return: False, если уже отправлен ответ с ошибкой
+        """
+        codings = {value.strip().lower() for header in self.headers.get_all('Transfer-Encoding', [])
+                   for value in header.split(',')}
+        if codings - {'identity', ''}:
+            self.send_error(411)
+            return False
+        lengths = self.headers.get_all('Content-Length', [])
+        if len(lengths) > 1 or (lengths and not lengths[0].strip().isdigit()):
+            self.send_error(400, 'Bad Content-Length')
+            return False
+        self.content_length = int(lengths[0]) if lengths else 0
+        return True
+
+    def get_environ(self):
+        path, _, query = self.path.partition('?')
+        length = self.content_length
+        environ = {
+            'REQUEST_METHOD': self.command,
+            'SCRIPT_NAME': '',
+            'PATH_INFO': unquote(path, 'iso-8859-1'),
+            'QUERY_STRING': query,
+            'CONTENT_TYPE': self.headers.get('Content-Type', ''),
+            'CONTENT_LENGTH': str(length) if length else '',
+            'SERVER_NAME': self.server.server_name,
+            'SERVER_PORT': str(self.server.server_port),
+            'SERVER_PROTOCOL': self.request_version,
+            'REMOTE_ADDR': self.client_address[0],
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': 'http',
+            'wsgi.input': LimitedInput(self.rfile, length),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        for key, value in self.headers.items():
+            key = key.upper().replace('-', '_')
+            if key in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+                continue
+            key = f'HTTP_{key}'
+            environ[key] = f'{environ[key]},{value}' if key in environ else value
+        return environ
+
+    def run_wsgi(self):
+        environ = self.get_environ()
+        state = {'status': None, 'headers': None, 'sent': False, 'chunked': False}
+
+        def write(data):
+            if not state['sent']:
+                send_headers()
+            if self.command == 'HEAD' or not data:
+                return
+            if state['chunked']:
+                self.wfile.write(f'{len(data):X}\r\n'.encode('latin-1') + data + b'\r\n')
+            else:
+                self.wfile.write(data)
+
+        def start_response(status, headers, exc_info=None):
+            if exc_info and state['sent']:
+                raise exc_info[1].with_traceback(exc_info[2])
+            state['status'] = status
+            state['headers'] = list(headers)
+            # Отклонённое тело не дочитываем - соединение закрывается.
+            if status.startswith('413'):
+                self.close_connection = True
+            return write
+
+        def send_headers():
+            state['sent'] = True
+            code, _, message = state['status'].partition(' ')
+            names = {name.lower() for name, value in state['headers']}
+            # У 1xx, 204 и 304 тела нет - ни Content-Length, ни chunked не нужны.
+            if 'content-length' not in names and code not in ('204', '304') and not code.startswith('1'):
+                if self.request_version == 'HTTP/1.1':
+                    state['chunked'] = True
+                    state['headers'].append(('Transfer-Encoding', 'chunked'))
+                else:
+                    self.close_connection = True
+            # Большой непрочитанный остаток тела не дочитываем - соединение закрывается.
+            if environ['wsgi.input'].remaining > MAX_DRAIN_SIZE:
+                self.close_connection = True
+            if self.close_connection or self.server.draining:
+                state['headers'].append(('Connection', 'close'))
+            elif self.request_version != 'HTTP/1.1':
+                state['headers'].append(('Connection', 'keep-alive'))
+            self.send_response(int(code), message)
+            for name, value in state['headers']:
+                self.send_header(name, value)
+            self.end_headers()
+
+        result = None
+        try:
+            result = self.server.application(environ, start_response)
+            # Для готового списка знаем длину заранее.
+            if isinstance(result, (list, tuple)) and \
+                    not any(name.lower() == 'content-length' for name, value in state['headers']):
+                state['headers'].append(('Content-Length', str(sum(len(data) for data in result))))
+            for data in result:
+                write(data)
+            if not state['sent']:
+                send_headers()
+            if state['chunked'] and self.command != 'HEAD':
+                self.wfile.write(b'0\r\n\r\n')
+        except (TimeoutError, ConnectionError):
+            raise
+        except Exception:
+            # Ошибка приложения: пишем в лог и, если заголовки ещё не ушли, отвечаем 500;
+            # иначе ответ уже не исправить - закрываем соединение.
+            self.server.handle_error(self.request, self.client_address)
+            self.close_connection = True
+            if not state['sent']:
+                self.send_error(500)
+            return
+        finally:
+            close = getattr(result, 'close', None)
+            if close:
+                close()
+        if environ['wsgi.input'].remaining > MAX_DRAIN_SIZE:
+            self.close_connection = True
+        elif not self.close_connection:
+            environ['wsgi.input'].drain()
+
+    def log_message(self, format, *args):
+        if self.server.access_log:
+            super().log_message(format, *args)
+
+
+class ThreadPoolServer(socketserver.TCPServer):
+    """
+    TCP-сервер с пулом потоков и ограниченной очередью соединений.
+    Если очередь заполнена, клиент сразу получает 503.
+    """
+
+    allow_reuse_address = True
+
+    def __init__(self, server_address, application, threads=SERVER_THREADS, queue_size=SERVER_QUEUE_SIZE,
+                 keep_alive_timeout=KEEP_ALIVE_TIMEOUT, access_log=False):
+        self.application = application
+        self.keep_alive_timeout = keep_alive_timeout
+        self.access_log = access_log
+        self.draining = False
+        # Очередь ожидания accept() в ядре.
+        self.request_queue_size = queue_size
+        self._requests = queue.Queue(queue_size)
+        super().__init__(server_address, WSGIRequestHandler)
+        host, port = self.server_address[:2]
+        self.server_name = socket.getfqdn(host)
+        self.server_port = port
+        self._threads = [threading.Thread(target=self._work, daemon=True) for _ in range(threads)]
+        for thread in self._threads:
+            thread.start()
+
+    def process_request(self, request, client_address):
+        try:
+            self._requests.put_nowait((request, client_address))
+        except queue.Full:
+            self._reject(request)
+
+    def _reject(self, request):
+        try:
+            request.sendall(b'HTTP/1.1 503 Service Unavailable\r\n'
+                            b'Content-Length: 0\r\nConnection: close\r\n\r\n')
+        except OSError:
+            pass
+        self.shutdown_request(request)
+
+    def _work(self):
+        while True:
+            item = self._requests.get()
+            if item is None:
+                return
+            request, client_address = item
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+    def handle_error(self, request, client_address):
+        logger.error('Ошибка обработки запроса от %s\n%s', client_address[0], traceback.format_exc())
+
+    def drain(self, timeout=SHUTDOWN_TIMEOUT):
+        # Дорабатываем принятые соединения и останавливаем потоки.
+        self.draining = True
+        for _ in self._threads:
+            self._requests.put(None)
+        for thread in self._threads:
+            thread.join(timeout)
+
+
+def _close(application):
+    close = getattr(application, 'close', None)
+    if close:
+        close()
+
+
+def _serve(server):
+    # SIGTERM: перестаём принимать соединения и дорабатываем текущие.
+    def stop(signum, frame):
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    try:
+        server.serve_forever()
+    finally:
+        server.drain()
+        server.server_close()
+
+
+def serve(application, host, port, threads=SERVER_THREADS, queue_size=SERVER_QUEUE_SIZE,
+          keep_alive_timeout=KEEP_ALIVE_TIMEOUT):
+    """
+    Боевой режим сервера: один процесс с пулом потоков. Данные приложения
+    живут в памяти процесса, поэтому несколько процессов не запускаются.
+    :param application: WSGI-приложение
+    :param host: адрес
+    :param port: порт
+    :param threads: потоков обработки
+    :param queue_size: длина очередей accept и ожидающих соединений
+    :param keep_alive_timeout: тайм-аут простоя keep-alive соединения, секунд
+    """
+    server = ThreadPoolServer((host, port), application, threads, queue_size, keep_alive_timeout)
+    print(f'Starting server http://{host}:{port} ({threads} threads)')
+    try:
+        _serve(server)
+    finally:
+        _close(application)
@@ -1,3 +1,95 @@
 HOST = '127.0.0.1'
 PORT = 8080
-SERVER_URL = f'http://{HOST}:{PORT}/'
\ No newline at end of file
+SERVER_URL = f'http://{HOST}:{PORT}/'
+
+# Боевой режим: шаблоны не перепроверяются на изменение файлов.
+PRODUCTION = False
+
+# Папка с шаблонами.
+TEMPLATES_DIR = 'templates'
+# Сколько скомпилированных шаблонов держим в памяти.
+TEMPLATES_CACHE_SIZE = 400
+# Папка для байт-кода шаблонов (None - не сохранять на диск).
+TEMPLATES_BYTECODE_DIR = None
+
+# Файл базы SQLite (None - данные только в памяти процесса).
+DATABASE_PATH = None
+
+# Размер страницы списков.
+PAGE_SIZE = 50
+
+# Размер блока при потоковой отдаче ответа, байт.
+STREAM_CHUNK_SIZE = 8192
+
+# Режим сервера: 'simple' - wsgiref, 'production' - lite_framework.server,
+# 'asgi' - AsgiApplication на lite_framework.asgi_server.
+SERVER_MODE = 'simple'
+# Потоков боевого сервера (один процесс: данные приложения в его памяти).
+SERVER_THREADS = 16
+# Длина очереди ожидающих соединений.
+SERVER_QUEUE_SIZE = 128
+# Тайм-аут простоя keep-alive соединения, секунд.
+KEEP_ALIVE_TIMEOUT = 5
+# Сколько ждать завершения текущих запросов при остановке, секунд.
+SHUTDOWN_TIMEOUT = 30
+
+# Потоков для синхронных контроллеров в ASGI-режиме.
+ASGI_THREADS = 16
+# Предел одновременных соединений asyncio-сервера.
+ASGI_MAX_CONNECTIONS = 10000
+
+# Ограничения разбора параметров и форм: число полей и длина поля.
+MAX_FORM_FIELDS = 1000
+MAX_FIELD_SIZE = 1024 * 1024
+
+# Максимальный размер тела запроса, байт.
+MAX_BODY_SIZE = 32 * 1024 * 1024
+# Сколько непрочитанного приложением тела сервер дочитывает ради keep-alive, байт;
+# при большем остатке соединение закрывается.
+MAX_DRAIN_SIZE = 64 * 1024
+# Размер блока при чтении тела запроса, байт.
+BODY_CHUNK_SIZE = 64 * 1024
+# Файлы из multipart/form-data больше этого размера уходят во временный файл, байт.
+UPLOAD_SPOOL_SIZE = 1024 * 1024
+
+# Уровень логирования: DEBUG, INFO, WARNING, ERROR или OFF.
+LOG_LEVEL = 'INFO'
+# Файл лога (None - консоль).
+LOG_FILE = None
+# Размер файла лога до ротации, байт, и число старых файлов.
+LOG_FILE_MAX_BYTES = 10 * 1024 * 1024
+LOG_FILE_BACKUPS = 5
+# Длина очереди фоновой записи; при переполнении записи отбрасываются.
+LOG_QUEUE_SIZE = 10000
+# Выборка отладочных записей: пишется одна из LOG_DEBUG_SAMPLE.
+LOG_DEBUG_SAMPLE = 1
+
+# Уведомления читателей: потоков доставки, интервал объединения событий (секунд),
+# число повторов и начальная задержка повтора (секунд).
+NOTIFY_WORKERS = 4
+NOTIFY_INTERVAL = 0.5
+NOTIFY_RETRIES = 3
+NOTIFY_BACKOFF = 0.5
+
+# JSON API: размер страницы по умолчанию, максимальный limit
+# и размер пачки при выгрузке JSONL.
+API_PAGE_SIZE = 100
+API_MAX_PAGE_SIZE = 1000
+EXPORT_BATCH_SIZE = 500
+
+# Кэш страниц: число записей и суммарный размер тел, байт.
+RESPONSE_CACHE_ENTRIES = 1000
+RESPONSE_CACHE_BYTES = 64 * 1024 * 1024
+
+# Кэш фрагментов шаблонов ({% cache %}): число записей и суммарный размер, символов.
+TEMPLATES_FRAGMENT_ENTRIES = 10000
+TEMPLATES_FRAGMENT_BYTES = 16 * 1024 * 1024
+
+# Сжатие ответов gzip/deflate: включено, уровень (1-9) и минимальный размер тела, байт.
+COMPRESS_ENABLED = True
+COMPRESS_LEVEL = 6
+COMPRESS_MIN_SIZE = 1024
+
+# Поиск: сколько слов словаря подставлять для префикса и размер страницы результатов.
+SEARCH_MAX_EXPANSIONS = 50
+SEARCH_PAGE_SIZE = 20
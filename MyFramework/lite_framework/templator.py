@@ -1,15 +1,117 @@
+import os
+import threading
+
 from jinja2.environment import Environment
-from jinja2 import Template, FileSystemLoader
+from jinja2 import Template, FileSystemLoader, FileSystemBytecodeCache, nodes
+from jinja2.ext import Extension
+
+from lite_framework.cache import LRUCache
+from lite_framework.settings import PRODUCTION, TEMPLATES_DIR, TEMPLATES_CACHE_SIZE, TEMPLATES_BYTECODE_DIR, \
+    TEMPLATES_FRAGMENT_ENTRIES, TEMPLATES_FRAGMENT_BYTES
+
+# Окружения Jinja2 по папкам шаблонов - одно на процесс.
+_environments = {}
+_lock = threading.Lock()
+
+# Кэш фрагментов шаблонов, общий для всех окружений.
+fragment_cache = LRUCache(TEMPLATES_FRAGMENT_ENTRIES, TEMPLATES_FRAGMENT_BYTES)
+
+
+class FragmentCacheExtension(Extension):
+    """
+    Тег {% cache key, ... %}...{% endcache %}: готовый HTML фрагмента
+    запоминается по месту в шаблоне и значениям ключей.
+    В ключ включают всё, от чего зависит фрагмент, например
+    {% cache item.id, version('note', item.id) %} - строка заметки
+    рендерится заново только после её изменения.
+    """
+
+    tags = {'cache'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        keys = []
+        while parser.stream.current.type != 'block_end':
+            if keys:
+                parser.stream.expect('comma')
+            keys.append(parser.parse_expression())
+        body = parser.parse_statements(('name:endcache',), drop_needle=True)
+        place = nodes.Const(f'{parser.name}:{lineno}')
+        return nodes.CallBlock(self.call_method('_cache', [place, nodes.Tuple(keys, 'load')]),
+                               [], [], body).set_lineno(lineno)
+
+    @staticmethod
+    def _cache(place, keys, caller):
+        key = (place, *keys)
+        value = fragment_cache.get(key)
+        if value is None:
+            value = caller()
+            fragment_cache.set(key, None, value, len(value))
+        return value
 
 
-def render(template_name, folder='templates', **kwargs):
+def get_environment(folder=TEMPLATES_DIR):
+    """
+    Возвращает общее окружение Jinja2 для папки шаблонов.
+    Скомпилированные шаблоны кешируются в памяти окружения,
+    при заданном TEMPLATES_BYTECODE_DIR - ещё и на диске.
+    :param folder: папка в которой ищем шаблон
+    :return: Environment
+    """
+    env = _environments.get(folder)
+    if env is None:
+        with _lock:
+            env = _environments.get(folder)
+            if env is None:
+                bytecode_cache = None
+                if TEMPLATES_BYTECODE_DIR:
+                    os.makedirs(TEMPLATES_BYTECODE_DIR, exist_ok=True)
+                    bytecode_cache = FileSystemBytecodeCache(TEMPLATES_BYTECODE_DIR)
+                env = Environment(
+                    loader=FileSystemLoader(folder),
+                    cache_size=TEMPLATES_CACHE_SIZE,
+                    # В боевом режиме не проверяем mtime файлов на каждый запрос.
+                    auto_reload=not PRODUCTION,
+                    bytecode_cache=bytecode_cache,
+                    extensions=[FragmentCacheExtension],
+                )
+                # Версия данных для ключей {% cache %}; приложение подставляет свою.
+                env.globals['version'] = lambda kind, id: 0
+                _environments[folder] = env
+    return env
+
+
+def warm_up(folder=TEMPLATES_DIR):
+    """
+    Компилирует все шаблоны папки заранее, при старте сервера.
+    :param folder: папка с шаблонами
+    :return: количество скомпилированных шаблонов
+    """
+    env = get_environment(folder)
+    names = env.list_templates()
+    for name in names:
+        env.get_template(name)
+    return len(names)
+
+
+def render(template_name, folder=TEMPLATES_DIR, **kwargs):
     """
     :param template_name: имя шаблона
     :param folder: папка в которой ищем шаблон
     :param kwargs: параметры
     :return:
     """
-    env = Environment()
-    env.loader = FileSystemLoader(folder)
-    template = env.get_template(template_name)
+    template = get_environment(folder).get_template(template_name)
     return template.render(**kwargs)
+
+
+def render_stream(template_name, folder=TEMPLATES_DIR, **kwargs):
+    """
+    Как render, но отдаёт страницу частями по мере рендеринга.
+    :param template_name: имя шаблона
+    :param folder: папка в которой ищем шаблон
+    :param kwargs: параметры
+    :return: генератор строк
+    """
+    template = get_environment(folder).get_template(template_name)
+    return template.generate(**kwargs)
@@ -0,0 +1,205 @@
+import sqlite3
+import threading
+
+
+# архитектурный системный паттерн - Unit of Work
+# Копит изменения и записывает их в хранилище одной транзакцией.
+# Если запись не удалась, отменяет изменения кеша в памяти (register_undo).
+class UnitOfWork:
+
+    def __init__(self, storage, counters=None):
+        self.storage = storage
+        self.counters = counters
+        self.depth = 0
+        self.new_objects = []
+        self.dirty_objects = []
+        self.removed_objects = []
+        self.undo_actions = []
+
+    def register_new(self, obj):
+        self.new_objects.append(obj)
+
+    def register_dirty(self, obj):
+        self.dirty_objects.append(obj)
+
+    def register_removed(self, obj):
+        self.removed_objects.append(obj)
+
+    def register_undo(self, action):
+        # Действие, возвращающее кеш в памяти к состоянию до транзакции.
+        self.undo_actions.append(action)
+
+    def rollback(self):
+        for action in reversed(self.undo_actions):
+            action()
+
+    def commit(self):
+        if self.new_objects or self.dirty_objects or self.removed_objects:
+            counters = self.counters() if self.counters else {}
+            self.storage.commit(self.new_objects, self.dirty_objects, self.removed_objects, counters)
+
+    def clear(self):
+        self.new_objects = []
+        self.dirty_objects = []
+        self.removed_objects = []
+        self.undo_actions = []
+
+    def __enter__(self):
+        self.depth += 1
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.depth -= 1
+        # Пишем только при выходе из самой внешней транзакции.
+        if self.depth == 0:
+            try:
+                if exc_type is not None:
+                    self.rollback()
+                else:
+                    try:
+                        self.commit()
+                    except Exception:
+                        self.rollback()
+                        raise
+            finally:
+                self.clear()
+        return False
+
+
+# Хранилище в памяти: ничего не сохраняет, используется по умолчанию.
+class MemoryStorage:
+
+    def commit(self, new_objects, dirty_objects, removed_objects, counters):
+        pass
+
+    def load(self):
+        return None
+
+    def close(self):
+        pass
+
+
+# архитектурный системный паттерн - Data Mapper
+# Переводит объекты предметной области в строки таблиц и обратно.
+class NoteMapper:
+    table = 'notes'
+
+    @staticmethod
+    def to_row(note):
+        return (note.id, type(note).__name__, note.name, note.description,
+                note.category.id, note.reader.id if note.reader else None)
+
+    insert_sql = 'INSERT INTO notes (id, class_name, name, description, category_id, reader_id) ' \
+                 'VALUES (?, ?, ?, ?, ?, ?)'
+    update_sql = 'UPDATE notes SET class_name = ?, name = ?, description = ?, category_id = ?, reader_id = ? ' \
+                 'WHERE id = ?'
+
+
+class CategoryMapper:
+    table = 'categories'
+
+    @staticmethod
+    def to_row(category):
+        return category.id, category.name, category.category.id if category.category else None
+
+    insert_sql = 'INSERT INTO categories (id, name, parent_id) VALUES (?, ?, ?)'
+    update_sql = 'UPDATE categories SET name = ?, parent_id = ? WHERE id = ?'
+
+
+class UserMapper:
+    table = 'users'
+
+    @staticmethod
+    def to_row(user):
+        return user.id, type(user).__name__, user.name
+
+    insert_sql = 'INSERT INTO users (id, class_name, name) VALUES (?, ?, ?)'
+    update_sql = 'UPDATE users SET class_name = ?, name = ? WHERE id = ?'
+
+
+class SqliteStorage:
+    """
+    Хранилище в SQLite (режим WAL), изменения пишутся транзакциями.
+    Чтение идёт только из памяти: load() поднимает все таблицы при старте,
+    запросы по индексам (кэш с дочитыванием из базы) - отдельная задача,
+    см. раздел "Known limitations" в README.
+    """
+
+    mappers = {
+        'notes': NoteMapper,
+        'categories': CategoryMapper,
+        'users': UserMapper,
+    }
+
+    schema = (
+        'CREATE TABLE IF NOT EXISTS categories ('
+        'id INTEGER PRIMARY KEY, name TEXT NOT NULL, parent_id INTEGER)',
+        'CREATE INDEX IF NOT EXISTS categories_parent_id ON categories (parent_id)',
+        'CREATE TABLE IF NOT EXISTS users ('
+        'id INTEGER PRIMARY KEY, class_name TEXT NOT NULL, name TEXT NOT NULL)',
+        'CREATE TABLE IF NOT EXISTS notes ('
+        'id INTEGER PRIMARY KEY, class_name TEXT NOT NULL, name TEXT NOT NULL, '
+        'description TEXT NOT NULL, category_id INTEGER NOT NULL, reader_id INTEGER)',
+        'CREATE INDEX IF NOT EXISTS notes_category_id ON notes (category_id)',
+        'CREATE INDEX IF NOT EXISTS notes_reader_id ON notes (reader_id)',
+        'CREATE TABLE IF NOT EXISTS counters (kind TEXT PRIMARY KEY, last_id INTEGER NOT NULL)',
+    )
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        # Транзакциями управляем сами (BEGIN/COMMIT).
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        for sql in self.schema:
+            self.connection.execute(sql)
+
+    def commit(self, new_objects, dirty_objects, removed_objects, counters):
+        with self._lock:
+            cursor = self.connection.cursor()
+            cursor.execute('BEGIN')
+            try:
+                # Новые объекты - простым INSERT: совпадение id - ошибка, а не перезапись чужой строки.
+                for obj in new_objects:
+                    mapper = self.mappers[obj.storage_table]
+                    cursor.execute(mapper.insert_sql, mapper.to_row(obj))
+                for obj in dirty_objects:
+                    mapper = self.mappers[obj.storage_table]
+                    id, *values = mapper.to_row(obj)
+                    cursor.execute(mapper.update_sql, (*values, id))
+                for obj in removed_objects:
+                    cursor.execute(f'DELETE FROM {obj.storage_table} WHERE id = ?', (obj.id,))
+                # Счётчики id только растут.
+                cursor.executemany('INSERT INTO counters (kind, last_id) VALUES (?, ?) ON CONFLICT (kind) '
+                                   'DO UPDATE SET last_id = max(last_id, excluded.last_id)', counters.items())
+                cursor.execute('COMMIT')
+            except Exception:
+                cursor.execute('ROLLBACK')
+                raise
+
+    def load(self):
+        """
+        Читает сохранённое состояние.
+        :return: словарь со строками categories, users, notes и counters
+        """
+        with self._lock:
+            cursor = self.connection.cursor()
+            # Родители идут раньше детей: сортируем по id, родитель всегда создан раньше.
+            categories = cursor.execute(
+                'SELECT id, name, parent_id FROM categories ORDER BY id').fetchall()
+            users = cursor.execute('SELECT id, class_name, name FROM users ORDER BY id').fetchall()
+            notes = cursor.execute(
+                'SELECT id, class_name, name, description, category_id, reader_id '
+                'FROM notes ORDER BY id').fetchall()
+            counters = dict(cursor.execute('SELECT kind, last_id FROM counters').fetchall())
+        return {
+            'categories': categories,
+            'users': users,
+            'notes': notes,
+            'counters': counters,
+        }
+
+    def close(self):
+        with self._lock:
+            self.connection.close()
@@ -1,6 +1,21 @@
+import atexit
+import bisect
+import http.client
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from operator import attrgetter
+
 import jsonpickle
 
-from lite_framework.settings import SERVER_URL
+from lite_framework.settings import SERVER_URL, PAGE_SIZE, LOG_FILE_MAX_BYTES, LOG_FILE_BACKUPS, LOG_QUEUE_SIZE, \
+    SHUTDOWN_TIMEOUT, NOTIFY_WORKERS, NOTIFY_INTERVAL, NOTIFY_RETRIES, NOTIFY_BACKOFF, EXPORT_BATCH_SIZE
 from lite_framework.templator import render
 
 
@@ -13,25 +28,240 @@ class Observer:
 
 
 class Subject:
-
-    def __init__(self):
-        self.observers = []
+    # Наблюдатели регистрируются один раз на класс, а не на каждый экземпляр.
+    __slots__ = ()
+    observers = ()
+
+    @classmethod
+    def attach(cls, observer):
+        if observer not in cls.__dict__.get('observers', ()):
+            cls.observers = cls.__dict__.get('observers', ()) + (observer,)
+
+    @classmethod
+    def detach(cls, observer):
+        cls.observers = tuple(item for item in cls.__dict__.get('observers', ()) if item is not observer)
+
+    def get_observers(self):
+        # Наблюдатели класса и всех его предков.
+        result = []
+        for cls in type(self).__mro__:
+            result.extend(cls.__dict__.get('observers', ()))
+        return result
 
     def notify(self):
-        for item in self.observers:
+        for item in self.get_observers():
             item.update(self)
 
 
-class SmsNotifier(Observer):
+# Транспорт уведомлений: печать в консоль (по умолчанию).
+class ConsoleTransport:
 
-    def update(self, subject):
-        print('SMS->', 'установлен читатель заметки:', subject.reader.name)
+    def send(self, channel, recipient, text):
+        print(f'{channel}->', recipient, text)
+
+    def close(self):
+        pass
 
 
-class EmailNotifier(Observer):
+# Транспорт для проверки: сообщения остаются в памяти процесса.
+class LocalTransport:
+
+    def __init__(self, fail_times=0):
+        self.messages = []
+        # Сколько первых отправок завершить ошибкой - для проверки повторов.
+        self.fail_times = fail_times
+        self.lock = threading.Lock()
+
+    def send(self, channel, recipient, text):
+        with self.lock:
+            if self.fail_times > 0:
+                self.fail_times -= 1
+                raise ConnectionError('LocalTransport: отказ отправки')
+            self.messages.append((channel, recipient, text))
+
+    def close(self):
+        pass
+
+
+class ConnectionPool:
+    """Пул соединений: соединение берётся из пула и возвращается после отправки."""
+
+    def __init__(self, factory, size=4):
+        self.factory = factory
+        self.idle = queue.LifoQueue(size)
+
+    @contextmanager
+    def connection(self):
+        try:
+            connection = self.idle.get_nowait()
+        except queue.Empty:
+            connection = self.factory()
+        try:
+            yield connection
+        except Exception:
+            # Соединение после ошибки в пул не возвращаем.
+            connection.close()
+            raise
+        try:
+            self.idle.put_nowait(connection)
+        except queue.Full:
+            connection.close()
+
+    def close(self):
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+# Транспорт через HTTP-шлюз (почтовый или SMS): POST JSON, соединения из пула.
+class HttpTransport:
+
+    def __init__(self, host, port=80, path='/', pool_size=4, timeout=10):
+        self.path = path
+        self.pool = ConnectionPool(lambda: http.client.HTTPConnection(host, port, timeout=timeout), pool_size)
+
+    def send(self, channel, recipient, text):
+        body = json.dumps({'channel': channel, 'recipient': recipient, 'text': text}).encode('utf-8')
+        with self.pool.connection() as connection:
+            connection.request('POST', self.path, body, {'Content-Type': 'application/json'})
+            response = connection.getresponse()
+            response.read()
+            if response.status >= 400:
+                raise ConnectionError(f'HttpTransport: {response.status} {response.reason}')
+
+    def close(self):
+        self.pool.close()
+
+
+class NotificationBus:
+    """
+    Шина уведомлений. События копятся interval секунд и объединяются
+    по (наблюдатель, читатель): читатель получает одно сообщение со всеми заметками,
+    повторное событие о той же заметке в пачку не добавляется.
+    Доставка идёт в пуле потоков, ошибки повторяются с экспоненциальной задержкой.
+    Поток и пул запускаются при первом событии; в процессе-потомке после fork - заново.
+    """
+
+    def __init__(self, workers=NOTIFY_WORKERS, interval=NOTIFY_INTERVAL, retries=NOTIFY_RETRIES,
+                 backoff=NOTIFY_BACKOFF):
+        self.workers = workers
+        self.interval = interval
+        self.retries = retries
+        self.backoff = backoff
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.executor = None
+        self.thread = None
+        self.stopped = threading.Event()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self.after_fork)
+        atexit.register(self.close)
+
+    def start(self):
+        # Вызывается под self.lock.
+        self.executor = ThreadPoolExecutor(self.workers, thread_name_prefix='notify')
+        self.thread = threading.Thread(target=self.run, name='notify-bus', daemon=True)
+        self.thread.start()
+
+    def after_fork(self):
+        # Потоки родителя в потомке не работают: сбрасываем их, события родителя доставит он сам.
+        stopped = self.stopped.is_set()
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        if stopped:
+            self.stopped.set()
+        self.pending = {}
+        self.executor = None
+        self.thread = None
+
+    def publish(self, observer, recipient_id, recipient, item, item_id=None):
+        """
+        :param item_id: ключ события в пачке (по умолчанию - сам item)
+        """
+        with self.lock:
+            if not self.stopped.is_set():
+                key = (observer, recipient_id)
+                if key not in self.pending:
+                    self.pending[key] = (recipient, {})
+                self.pending[key][1][item if item_id is None else item_id] = item
+                if self.thread is None:
+                    self.start()
+                return
+        # Шина остановлена: доставляем сразу.
+        self.deliver(observer, recipient, [item])
+
+    def flush(self, wait=False):
+        with self.lock:
+            pending, self.pending = self.pending, {}
+        for (observer, _), (recipient, items) in pending.items():
+            if wait:
+                self.deliver(observer, recipient, list(items.values()))
+            else:
+                self.executor.submit(self.deliver, observer, recipient, list(items.values()))
+
+    def deliver(self, observer, recipient, items):
+        for attempt in range(self.retries + 1):
+            try:
+                observer.deliver(recipient, items)
+                return
+            except Exception as error:
+                if attempt == self.retries:
+                    sys.stderr.write(f'notify-bus: не доставлено {recipient}: {error}\n')
+                    return
+                time.sleep(self.backoff * 2 ** attempt)
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.flush()
+
+    def close(self):
+        with self.lock:
+            if self.stopped.is_set():
+                return
+            self.stopped.set()
+            thread, executor = self.thread, self.executor
+        if thread is not None:
+            thread.join()
+            executor.shutdown(wait=True)
+        # При остановке пул уже не принимает задачи - досылаем оставшееся сами.
+        self.flush(wait=True)
+
+
+class Notifier(Observer):
+    """
+    Уведомление читателя заметки.
+    Без шины сообщение отправляется сразу, с шиной - в фоне и пачкой.
+    """
+
+    channel = ''
+
+    def __init__(self, transport=None, bus=None):
+        self.transport = transport or ConsoleTransport()
+        self.bus = bus
 
     def update(self, subject):
-        print(('EMAIL->', 'установлен читатель заметки:', subject.reader.name))
+        reader = subject.reader
+        if self.bus is None:
+            self.deliver(reader.name, [subject.name])
+        else:
+            self.bus.publish(self, reader.id, reader.name, subject.name, subject.id)
+
+    def deliver(self, recipient, items):
+        self.transport.send(self.channel, recipient, self.format(items))
+
+    @staticmethod
+    def format(items):
+        return f'установлен читатель заметок: {", ".join(items)}'
+
+
+class SmsNotifier(Notifier):
+    channel = 'SMS'
+
+
+class EmailNotifier(Notifier):
+    channel = 'EMAIL'
 
 
 class BaseSerializer:
@@ -47,11 +277,321 @@ class BaseSerializer:
         return jsonpickle.loads(data)
 
 
+def related_id(name):
+    # id связанного объекта вместо самого объекта.
+    getter = attrgetter(name)
+
+    def get(obj):
+        return getattr(getter(obj), 'id', None)
+    return get
+
+
+class Schema:
+    """
+    Схема сериализации: в JSON попадают только объявленные поля.
+    fields - словарь имя -> функция получения значения.
+    :param only: выбранные поля (неизвестные пропускаются), None - все
+    """
+
+    fields = {}
+
+    def __init__(self, only=None):
+        names = [name for name in only if name in self.fields] if only else None
+        self.getters = [(name, self.fields[name]) for name in (names or self.fields)]
+
+    def dump(self, obj):
+        return {name: getter(obj) for name, getter in self.getters}
+
+
+class NoteSchema(Schema):
+    fields = {
+        'id': attrgetter('id'),
+        'name': attrgetter('name'),
+        'description': attrgetter('description'),
+        'category': related_id('category'),
+        'reader': related_id('reader'),
+    }
+
+
+class CategorySchema(Schema):
+    fields = {
+        'id': attrgetter('id'),
+        'name': attrgetter('name'),
+        'parent': related_id('category'),
+        'notes_count': lambda category: category.notes_count(),
+    }
+
+
+class ReaderSchema(Schema):
+    fields = {
+        'id': attrgetter('id'),
+        'name': attrgetter('name'),
+        'notes_count': lambda reader: len(reader.notes),
+    }
+
+
+class JsonStream:
+    """
+    Потоковая выдача JSON: ответ отдаётся кусками, объект за объектом,
+    целиком в памяти не собирается.
+    """
+
+    encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+    def __init__(self, schema):
+        self.schema = schema
+
+    def page(self, queryset):
+        # Страница: {"items": [...], "next_cursor": курсор или null, "has_next": bool}.
+        encode = self.encoder.encode
+        dump = self.schema.dump
+        yield '{"items":['
+        for number, item in enumerate(queryset):
+            yield f',{encode(dump(item))}' if number else encode(dump(item))
+        yield f'],"next_cursor":{encode(queryset.next_cursor)},"has_next":{encode(queryset.has_next)}}}'
+
+    def lines(self, collection, batch_size=EXPORT_BATCH_SIZE):
+        # JSONL по всей коллекции: читаем пачками по курсору, память не зависит от размера данных.
+        encode = self.encoder.encode
+        dump = self.schema.dump
+        queryset = QuerySet(collection).page(1, batch_size)
+        while True:
+            for item in queryset:
+                yield f'{encode(dump(item))}\n'
+            cursor = queryset.next_cursor
+            if cursor is None:
+                return
+            queryset = QuerySet(collection).after(cursor).page(1, batch_size)
+
+
+# Готовая страница результатов (например, поиска) для шаблонов пагинации и JsonStream.
+class ResultPage:
+
+    def __init__(self, items, number, has_next, ordering=''):
+        self.items = items
+        self.number = number
+        self.has_next = has_next
+        self.ordering = ordering
+
+    @property
+    def has_previous(self):
+        return self.number > 1
+
+    @property
+    def next_cursor(self):
+        return None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __bool__(self):
+        return bool(self.items)
+
+
+# Ленивая выборка: сортировка, limit/offset и keyset-пагинация.
+# Для коллекций с отсортированными индексами (IdCollection) страница
+# берётся срезом индекса, без сортировки и обхода всей коллекции.
+class QuerySet:
+
+    def __init__(self, collection, ordering='id', offset=0, limit=None, after=None):
+        self.collection = collection
+        self.ordering = ordering
+        self.offset = offset
+        self.limit = limit
+        # Курсор: id последнего объекта или (ключ сортировки, id).
+        self.cursor = after
+        self._result = None
+        self._has_next = False
+
+    @classmethod
+    def from_params(cls, collection, params, page_size=PAGE_SIZE, ordering='id'):
+        """
+        Выборка по параметрам запроса: order, page и after.
+        :param collection: коллекция объектов
+        :param params: параметры запроса
+        :param page_size: размер страницы
+        :param ordering: сортировка по умолчанию
+        :return: QuerySet
+        """
+        params = params or {}
+        queryset = cls(collection).order_by(params.get('order') or ordering)
+        cursor = cls.parse_cursor(params.get('after') or '')
+        if cursor is not None:
+            return queryset.after(cursor).page(1, page_size)
+        page = params.get('page', '1')
+        return queryset.page(int(page) if page.isdigit() and int(page) > 0 else 1, page_size)
+
+    @staticmethod
+    def parse_cursor(value):
+        """
+        Курсор из параметра after: 'id' или 'ключ:id' для сортировки не по id.
+        :return: id, (ключ, id) или None
+        """
+        if value.isdigit():
+            return int(value)
+        key, separator, id = value.rpartition(':')
+        if separator and id.isdigit():
+            return key, int(id)
+        return None
+
+    def _copy(self, **kwargs):
+        params = {
+            'ordering': self.ordering,
+            'offset': self.offset,
+            'limit': self.limit,
+            'after': self.cursor,
+        }
+        params.update(kwargs)
+        return self.__class__(self.collection, **params)
+
+    @property
+    def field(self):
+        return self.ordering.lstrip('-')
+
+    @property
+    def descending(self):
+        return self.ordering.startswith('-')
+
+    def order_by(self, ordering):
+        if not self._has_ordering(ordering.lstrip('-')):
+            ordering = 'id'
+        return self._copy(ordering=ordering)
+
+    def page(self, number, size):
+        return self._copy(offset=(number - 1) * size, limit=size)
+
+    def after(self, cursor):
+        return self._copy(after=cursor, offset=0)
+
+    @property
+    def number(self):
+        return self.offset // self.limit + 1 if self.limit else 1
+
+    @property
+    def has_previous(self):
+        return self.offset > 0
+
+    @property
+    def has_next(self):
+        self._fetch()
+        return self._has_next
+
+    @property
+    def next_cursor(self):
+        # При сортировке не по id курсор содержит и ключ: страница продолжится,
+        # даже если этот объект к тому времени удалён.
+        result = self._fetch()
+        if not result or not self._has_next:
+            return None
+        item = result[-1]
+        if self.field == 'id':
+            return item.id
+        return f'{self._sort_key(item)}:{item.id}'
+
+    def count(self):
+        return len(self.collection)
+
+    def _has_ordering(self, field):
+        index = getattr(self.collection, 'sorted_index', None)
+        if index is not None:
+            return index(field) is not None
+        return field in ('id', 'name')
+
+    def _index(self):
+        index = getattr(self.collection, 'sorted_index', None)
+        return index(self.field) if index else None
+
+    def _sort_key(self, item):
+        index = self._index()
+        return index.key(item) if index is not None else getattr(item, self.field)
+
+    def _fetch(self):
+        if self._result is None:
+            index = self._index()
+            if index is not None:
+                self._result = self._fetch_index(index)
+            else:
+                self._result = self._fetch_list()
+        return self._result
+
+    def _cursor_entry(self, index):
+        # (ключ, id), с которым сравниваются записи индекса.
+        if isinstance(self.cursor, tuple):
+            key, id = self.cursor
+            return (id, id) if self.field == 'id' else (key, id)
+        item = self.collection.get(self.cursor)
+        if item is not None:
+            return index.entry(item)
+        if self.field == 'id':
+            return self.cursor, self.cursor
+        return None
+
+    def _fetch_index(self, index):
+        keys = index.keys
+        limit = self.limit if self.limit is not None else len(keys)
+        if not self.descending:
+            start = self.offset
+            if self.cursor is not None:
+                entry = self._cursor_entry(index)
+                start += bisect.bisect_right(keys, entry) if entry else 0
+            entries = keys[start:start + limit + 1]
+        else:
+            stop = len(keys) - self.offset
+            if self.cursor is not None:
+                entry = self._cursor_entry(index)
+                stop = bisect.bisect_left(keys, entry) - self.offset if entry else stop
+            stop = max(stop, 0)
+            entries = keys[max(stop - limit - 1, 0):stop][::-1]
+        self._has_next = len(entries) > limit
+        return [self.collection.get(id) for key, id in entries[:limit]]
+
+    def _fetch_list(self):
+        # Обычный список: сортируем целиком.
+        items = sorted(self.collection, key=lambda item: (getattr(item, self.field), item.id),
+                       reverse=self.descending)
+        if isinstance(self.cursor, tuple):
+            entry = self.cursor
+            if self.descending:
+                items = [item for item in items if (getattr(item, self.field), item.id) < entry]
+            else:
+                items = [item for item in items if (getattr(item, self.field), item.id) > entry]
+        elif self.cursor is not None:
+            ids = [item.id for item in items]
+            if self.cursor in ids:
+                items = items[ids.index(self.cursor) + 1:]
+        limit = self.limit if self.limit is not None else len(items)
+        entries = items[self.offset:self.offset + limit + 1]
+        self._has_next = len(entries) > limit
+        return entries[:limit]
+
+    def __iter__(self):
+        return iter(self._fetch())
+
+    def __len__(self):
+        return len(self._fetch())
+
+    def __bool__(self):
+        return bool(self._fetch())
+
+    def __getitem__(self, item):
+        if isinstance(item, slice) and (item.step or 1) == 1:
+            start = item.start or 0
+            stop = item.stop if item.stop is not None else None
+            limit = None if stop is None else max(stop - start, 0)
+            if self.limit is not None:
+                limit = self.limit - start if limit is None else min(limit, self.limit - start)
+            return self._copy(offset=self.offset + start, limit=limit)
+        return self._fetch()[item]
+
+
 # поведенческий паттерн - Шаблонный метод
 class TemplateView:
     template_name = 'template.html'
 
-    def get_context_data(self):
+    def get_context_data(self, request=None):
         data = {}
         data['data'] = {'server_url': SERVER_URL}
         return data
@@ -59,33 +599,35 @@ class TemplateView:
     def get_template(self):
         return self.template_name
 
-    def render_template_with_context(self):
+    def render_template_with_context(self, request=None):
         template_name = self.get_template()
-        context = self.get_context_data()
+        context = self.get_context_data(request)
         return '200 OK', render(template_name, **context)
 
     def __call__(self, request):
-        return self.render_template_with_context()
+        return self.render_template_with_context(request)
 
 
 class ListView(TemplateView):
     queryset = []
     template_name = 'list.html'
     context_object_name = 'objects_list'
+    paginate_by = PAGE_SIZE
+    ordering = 'id'
 
-
-    def get_queryset(self):
-        print(self.queryset)
-        return self.queryset
+    def get_queryset(self, request=None):
+        params = request.get('request_params') if request else None
+        return QuerySet.from_params(self.queryset, params, self.paginate_by, self.ordering)
 
     def get_context_object_name(self):
         return self.context_object_name
 
-    def get_context_data(self):
-        context = super().get_context_data()
-        queryset = self.get_queryset()
+    def get_context_data(self, request=None):
+        context = super().get_context_data(request)
+        queryset = self.get_queryset(request)
         context_object_name = self.get_context_object_name()
         context[context_object_name] = queryset
+        context['page'] = queryset
         return context
 
 
@@ -105,7 +647,7 @@ class CreateView(TemplateView):
             data = self.get_request_data(request)
             self.create_obj(data)
 
-            return self.render_template_with_context()
+            return self.render_template_with_context(request)
         else:
             return super().__call__(request)
 
@@ -130,13 +672,125 @@ class ConsoleWriter:
     def write(self, text):
         print(text)
 
+    def write_batch(self, lines):
+        sys.stdout.write(''.join(f'{line}\n' for line in lines))
+        sys.stdout.flush()
+
+    def close(self):
+        pass
+
 
 class FileWriter:
+    """
+    Запись в файл: файл держится открытым, строки пишутся пачками через буфер.
+    При превышении max_bytes файл переименовывается в name.1 (name.1 - в name.2 и т.д.).
+    """
 
-    def __init__(self, file_name):
+    def __init__(self, file_name, max_bytes=LOG_FILE_MAX_BYTES, backup_count=LOG_FILE_BACKUPS):
         self.file_name = file_name
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.lock = threading.Lock()
+        self.file = None
+        self.size = 0
+
+    def open(self):
+        self.file = open(self.file_name, 'ab', buffering=65536)
+        self.size = self.file.tell()
+
+    def rotate(self):
+        self.file.close()
+        for number in range(self.backup_count - 1, 0, -1):
+            source = f'{self.file_name}.{number}'
+            if os.path.exists(source):
+                os.replace(source, f'{self.file_name}.{number + 1}')
+        if self.backup_count > 0:
+            os.replace(self.file_name, f'{self.file_name}.1')
+        else:
+            os.remove(self.file_name)
+        self.open()
 
     def write(self, text):
-        with open(self.file_name, 'a', encoding='utf-8') as f:
-            f.write(f'{text}\n')
+        self.write_batch([text])
+
+    def write_batch(self, lines):
+        with self.lock:
+            if self.file is None:
+                self.open()
+            for line in lines:
+                data = f'{line}\n'.encode('utf-8')
+                if self.max_bytes and self.size and self.size + len(data) > self.max_bytes:
+                    self.rotate()
+                self.file.write(data)
+                self.size += len(data)
+            self.file.flush()
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+
+class QueueWriter:
+    """
+    Фоновая запись: записи передаются потоку через ограниченную очередь (deque),
+    поток забирает их пачками раз в interval секунд. Если очередь заполнена,
+    запись отбрасывается - обработка запроса никогда не ждёт диск или консоль.
+    Записи - кортежи (время, уровень, имя логгера, сообщение, аргументы),
+    строки форматируются уже в фоновом потоке.
+    """
+
+    interval = 0.05
+
+    def __init__(self, writer, queue_size=LOG_QUEUE_SIZE):
+        self.writer = writer
+        self.queue_size = queue_size
+        # append и popleft у deque потокобезопасны, блокировка на запись не нужна.
+        self.records = deque()
+        self.dropped = 0
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name='log-writer', daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def put(self, record):
+        if len(self.records) >= self.queue_size:
+            self.dropped += 1
+            return
+        self.records.append(record)
+
+    @staticmethod
+    def format(record):
+        created, level, name, message, args = record
+        if args:
+            message = message % args
+        return f'{time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(created))} {level} {name} ---> {message}'
+
+    def flush(self):
+        lines = []
+        while True:
+            try:
+                lines.append(self.format(self.records.popleft()))
+            except IndexError:
+                break
+        if self.dropped:
+            lines.append(f'log-writer: отброшено записей: {self.dropped}')
+            self.dropped = 0
+        if lines:
+            try:
+                self.writer.write_batch(lines)
+            except Exception as error:
+                sys.stderr.write(f'log-writer: {error}\n')
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.flush()
+        self.flush()
+
+    def close(self):
+        if self.thread.is_alive():
+            self.stopped.set()
+            self.thread.join(SHUTDOWN_TIMEOUT)
+        self.writer.close()
 
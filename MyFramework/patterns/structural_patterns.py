@@ -1,20 +1,50 @@
 from time import time
 
+from lite_framework.router import MethodDispatch
+from patterns.сreational_patterns import Logger, DEBUG
+
+debug_logger = Logger('debug')
+
 
 # структурный паттерн - Декоратор
 class AppRoute:
-    def __init__(self, routes, url):
+    def __init__(self, routes, url, methods=None, fronts=None, exclude_fronts=(), cache_page=False):
         '''
-        Сохраняем значение переданного параметра
+        Сохраняем значение переданного параметра.
+        url может содержать параметры пути: '/note/<int:id>/',
+        methods - ограничение по HTTP-методам: ('GET', 'POST'),
+        fronts - свои front controllers маршрута (() - без них),
+        exclude_fronts - front controllers (объекты или имена), которые маршруту не нужны,
+        cache_page - кэшировать страницу (контроллеру нужен метод validators).
         '''
         self.routes = routes
         self.url = url
+        self.methods = methods
+        self.fronts = fronts
+        self.exclude_fronts = exclude_fronts
+        self.cache_page = cache_page
 
     def __call__(self, cls):
         '''
         Сам декоратор
         '''
-        self.routes[self.url] = cls()
+        if self.methods:
+            dispatch = self.routes.get(self.url)
+            if not isinstance(dispatch, MethodDispatch):
+                dispatch = MethodDispatch()
+                self.routes[self.url] = dispatch
+            view = dispatch
+            dispatch.add(self.methods, cls())
+        else:
+            view = self.routes[self.url] = cls()
+        # Настройки цепочки front controllers читаются при старте приложения.
+        if self.fronts is not None:
+            view.fronts = self.fronts
+        if self.exclude_fronts:
+            view.exclude_fronts = self.exclude_fronts
+        if self.cache_page:
+            view.cache_page = True
+        return cls
 
 
 # структурный паттерн - Декоратор
@@ -36,12 +66,15 @@ class Debug:
             каждый метод декорируемого класса
             '''
             def timed(*args, **kw):
+                # Без уровня DEBUG время не замеряем.
+                if not debug_logger.is_enabled(DEBUG):
+                    return method(*args, **kw)
                 ts = time()
                 result = method(*args, **kw)
                 te = time()
-                delta = te - ts
+                delta = (te - ts) * 1000
 
-                print(f'debug --> {self.name} выполнялся {delta:2.2f} ms')
+                debug_logger.debug('%s выполнялся %2.2f ms', self.name, delta)
                 return result
 
             return timed
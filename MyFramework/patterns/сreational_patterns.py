@@ -1,27 +1,374 @@
+import bisect
 import copy
-import quopri
-from patterns.behavioral_patterns import Subject, ConsoleWriter
+import heapq
+import html
+import re
+import threading
+import time
+from functools import wraps
+from itertools import count, islice
+from operator import attrgetter
+
+from lite_framework.settings import LOG_LEVEL, LOG_FILE, LOG_DEBUG_SAMPLE, SEARCH_MAX_EXPANSIONS
+from patterns.architectural_patterns import UnitOfWork, MemoryStorage
+from patterns.behavioral_patterns import Subject, ConsoleWriter, FileWriter, QueueWriter
+
+
+# Отсортированный индекс коллекции: пары (ключ, id) в порядке возрастания.
+class SortedIndex:
+    __slots__ = ('key', 'keys')
+
+    def __init__(self, key):
+        self.key = key
+        self.keys = []
+
+    def entry(self, item):
+        return self.key(item), item.id
+
+    def add(self, item):
+        bisect.insort(self.keys, self.entry(item))
+
+    def remove(self, item):
+        entry = self.entry(item)
+        position = bisect.bisect_left(self.keys, entry)
+        if position < len(self.keys) and self.keys[position] == entry:
+            del self.keys[position]
+
+    def clear(self):
+        self.keys.clear()
+
+    def __len__(self):
+        return len(self.keys)
+
+
+# Упорядоченная коллекция объектов с индексом по id:
+# добавление, поиск и удаление за O(1), порядок добавления сохраняется.
+# Дополнительно может поддерживать отсортированные индексы по полям.
+class IdCollection:
+    __slots__ = ('_items', 'indexes')
+
+    def __init__(self, items=(), orderings=None):
+        self._items = {}
+        self.indexes = {name: SortedIndex(key) for name, key in (orderings or {}).items()}
+        for item in items:
+            self.append(item)
+
+    def append(self, item):
+        old = self._items.get(item.id)
+        if old is item:
+            return
+        if old is not None:
+            self._unindex(old)
+        self._items[item.id] = item
+        for index in self.indexes.values():
+            index.add(item)
+
+    def _unindex(self, item):
+        for index in self.indexes.values():
+            index.remove(item)
+
+    def get(self, id, default=None):
+        return self._items.get(id, default)
+
+    def pop(self, id, default=None):
+        item = self._items.pop(id, None)
+        if item is None:
+            return default
+        self._unindex(item)
+        return item
+
+    def remove(self, item):
+        if self._items.get(item.id) is not item:
+            raise ValueError(f'Нет объекта с id = {item.id}')
+        del self._items[item.id]
+        self._unindex(item)
+
+    def discard(self, item):
+        if self._items.get(item.id) is item:
+            del self._items[item.id]
+            self._unindex(item)
+
+    def clear(self):
+        self._items.clear()
+        for index in self.indexes.values():
+            index.clear()
+
+    def sorted_index(self, name):
+        return self.indexes.get(name)
+
+    def __contains__(self, item):
+        return self._items.get(getattr(item, 'id', None)) is item
+
+    def __iter__(self):
+        return iter(list(self._items.values()))
+
+    def __len__(self):
+        return len(self._items)
+
+    def __bool__(self):
+        return bool(self._items)
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({list(self._items.values())!r})'
+
+
+# Сортировки, доступные для списков.
+NAME_ORDERINGS = {
+    'id': attrgetter('id'),
+    'name': attrgetter('name'),
+}
+NOTE_ORDERINGS = {
+    **NAME_ORDERINGS,
+    'category': lambda note: note.category.name,
+}
+
+
+TAG_RE = re.compile(r'<[^>]*>')
+WORD_RE = re.compile(r'\w+')
+
+
+def tokenize(text):
+    # Слова текста в нижнем регистре, без HTML-тегов и сущностей.
+    return WORD_RE.findall(html.unescape(TAG_RE.sub(' ', text or '')).lower())
+
+
+class SearchIndex:
+    """
+    Инвертированный индекс заметок по name и description.
+    Для каждого слова хранится упорядоченное множество id заметок
+    (dict в порядке добавления) отдельно для названий и для описаний,
+    словарь слов отсортирован - для поиска по префиксу.
+    Выдача: сначала совпадения в названии, затем в описании.
+    """
+
+    def __init__(self, max_expansions=SEARCH_MAX_EXPANSIONS):
+        self.max_expansions = max_expansions
+        self.name_postings = {}
+        self.text_postings = {}
+        self.terms = []
+        self.documents = {}
+        self.lock = threading.Lock()
+
+    def _add_term(self, postings, term, id):
+        ids = postings.get(term)
+        if ids is None:
+            ids = postings[term] = {}
+            if term not in self.name_postings or term not in self.text_postings:
+                bisect.insort(self.terms, term)
+        ids[id] = None
+
+    def _remove_term(self, postings, other, term, id):
+        ids = postings.get(term)
+        if ids is None:
+            return
+        ids.pop(id, None)
+        if not ids:
+            del postings[term]
+            if term not in other:
+                position = bisect.bisect_left(self.terms, term)
+                if position < len(self.terms) and self.terms[position] == term:
+                    del self.terms[position]
+
+    def add(self, note):
+        name_terms = set(tokenize(note.name))
+        text_terms = set(tokenize(note.description))
+        with self.lock:
+            if note.id in self.documents:
+                self._remove(note.id)
+            self.documents[note.id] = (name_terms, text_terms)
+            for term in name_terms:
+                self._add_term(self.name_postings, term, note.id)
+            for term in text_terms:
+                self._add_term(self.text_postings, term, note.id)
+
+    def remove(self, note):
+        with self.lock:
+            self._remove(note.id)
+
+    def name_candidates(self, terms):
+        """
+        Кандидаты для поиска заметки по названию: копия самого короткого
+        списка id среди слов terms, снятая под блокировкой.
+        :return: список id (точное сравнение названия - у вызывающего)
+        """
+        with self.lock:
+            return list(min((self.name_postings.get(term, {}) for term in terms), key=len))
+
+    def _remove(self, id):
+        document = self.documents.pop(id, None)
+        if document is None:
+            return
+        name_terms, text_terms = document
+        for term in name_terms:
+            self._remove_term(self.name_postings, self.text_postings, term, id)
+        for term in text_terms:
+            self._remove_term(self.text_postings, self.name_postings, term, id)
+
+    def expand(self, token, prefix=True):
+        # Слово и слова с этим префиксом (не больше max_expansions).
+        if not prefix:
+            return [token] if token in self.name_postings or token in self.text_postings else []
+        start = bisect.bisect_left(self.terms, token)
+        result = []
+        for term in self.terms[start:start + self.max_expansions]:
+            if not term.startswith(token):
+                break
+            result.append(term)
+        return result
+
+    def _match(self, token, prefix):
+        terms = self.expand(token, prefix)
+        names = [self.name_postings[term] for term in terms if term in self.name_postings]
+        texts = [self.text_postings[term] for term in terms if term in self.text_postings]
+        return names, texts
+
+    def _single(self, names, texts):
+        # Одно слово: обходим списки лениво, без сортировки.
+        seen = set()
+        for postings in (names, texts):
+            for ids in postings:
+                for id in ids:
+                    if id not in seen:
+                        seen.add(id)
+                        yield id
+
+    @staticmethod
+    def _union(postings):
+        # Множество id по спискам слова (и его продолжений), строится на C-скорости.
+        if len(postings) == 1:
+            return set(postings[0])
+        return set().union(*postings)
+
+    @staticmethod
+    def _restrict(postings, candidates):
+        # id из списков, входящие в candidates: обходится меньшее из двух множеств.
+        result = set()
+        for ids in postings:
+            result |= ids.keys() & candidates
+        return result
+
+    @staticmethod
+    def _rank(candidates, name_sets, needed, accept=None):
+        """
+        Лучшие needed id: чем больше слов в названии - тем выше, при равенстве - меньший id.
+        :param name_sets: по каждому слову - id кандидатов с этим словом в названии
+        """
+        # levels[n] - кандидаты, у которых n слов найдено в названии; только операции над множествами.
+        levels = [candidates]
+        for names in name_sets:
+            if not names:
+                continue
+            shifted = [set() for _ in range(len(levels) + 1)]
+            for number, ids in enumerate(levels):
+                if not ids:
+                    continue
+                matched = ids & names
+                shifted[number + 1] |= matched
+                shifted[number] |= ids - matched
+            levels = shifted
+        # Уровни по убыванию, внутри уровня - ограниченная куча вместо полной сортировки.
+        result = []
+        for ids in reversed(levels):
+            if accept is not None:
+                ids = filter(accept, ids)
+            result.extend(heapq.nsmallest(needed - len(result), ids))
+            if len(result) >= needed:
+                break
+        return result
+
+    def search(self, query, offset=0, limit=20, accept=None):
+        """
+        Поиск заметок: все слова запроса должны встретиться в name или description,
+        последнее слово ищется ещё и как префикс.
+        :param accept: фильтр id -> bool (например, по категории)
+        :return: (список id страницы, есть ли следующая страница)
+        """
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return [], False
+        with self.lock:
+            matches = [self._match(token, prefix=number == len(tokens) - 1)
+                       for number, token in enumerate(tokens)]
+            if not all(names or texts for names, texts in matches):
+                return [], False
+            if len(matches) == 1 and accept is None:
+                # Одно слово без фильтра: первая страница берётся из списков лениво.
+                page = list(islice(self._single(*matches[0]), offset, offset + limit + 1))
+                return page[:limit], len(page) > limit
+            # Пересечение - с самого редкого слова: остальные списки только проверяются
+            # на вхождение кандидатов. Под блокировкой - только снимок множеств, отбор - без неё.
+            matches.sort(key=lambda match: sum(len(ids) for postings in match for ids in postings))
+            names, texts = matches[0]
+            names = self._union(names)
+            candidates = names | self._union(texts)
+            name_sets = [names]
+            for names, texts in matches[1:]:
+                names = self._restrict(names, candidates)
+                candidates = names | self._restrict(texts, candidates)
+                name_sets.append(names)
+        page = self._rank(candidates, name_sets, offset + limit + 1, accept)[offset:]
+        return page[:limit], len(page) > limit
+
+
+# Генератор id: монотонные счётчики по видам объектов, O(1) и потокобезопасно.
+class IdGenerator:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last = {}
+
+    def next_id(self, kind):
+        with self._lock:
+            new_id = self._last.get(kind, 0) + 1
+            self._last[kind] = new_id
+            return new_id
+
+    def take(self, kind, id=None):
+        # Новый id либо учёт уже известного.
+        if id is None:
+            return self.next_id(kind)
+        self.observe(kind, id)
+        return id
+
+    def observe(self, kind, id):
+        # Учитываем уже занятый id (например, загруженный из хранилища).
+        with self._lock:
+            if id > self._last.get(kind, 0):
+                self._last[kind] = id
+
+    def get_state(self):
+        with self._lock:
+            return dict(self._last)
+
+    def set_state(self, state):
+        # Восстановление после перезапуска: счётчики только растут.
+        for kind, id in state.items():
+            self.observe(kind, int(id))
+
+
+id_generator = IdGenerator()
 
 
 # Абстрактный пользователь.
 class User:
-    auto_id = 1
+    __slots__ = ('id', 'name')
+    storage_table = 'users'
 
-    def __init__(self, name):
-        self.id = User.auto_id
-        User.auto_id += 1
+    def __init__(self, name, id=None):
+        self.id = id_generator.take('user', id)
         self.name = name
 
 # Читатель.
 class Reader(User):
+    __slots__ = ('notes',)
 
-    def __init__(self, name):
-        self.notes = []
-        super().__init__(name)
+    def __init__(self, name, id=None):
+        self.notes = IdCollection()
+        super().__init__(name, id)
 
 # Редактор.
 class Editor(User):
-    pass
+    __slots__ = ()
 
 # Порождающий паттерн Абстрактная фабрика - фабрика пользователей.
 class UserFactory:
@@ -32,31 +379,42 @@ class UserFactory:
 
     # Порождающий паттерн Фабричный метод.
     @classmethod
-    def create(cls, type_, name):
-        return cls.types[type_](name)
+    def create(cls, type_, name, id=None):
+        return cls.types[type_](name, id)
 
 # Порождающий паттерн Прототип - заметка
 class NotePrototype:
     # Прототип заметок.
+    __slots__ = ()
 
     def clone(self):
-        return copy.deepcopy(self)
+        # Поверхностная копия: ссылки на связанные объекты общие.
+        return copy.copy(self)
 
 
 class Note(NotePrototype, Subject):
-    auto_id = 1
+    __slots__ = ('id', 'name', 'description', 'category', 'reader')
+    storage_table = 'notes'
 
-    def __init__(self, name, description, category):
-        self.id = Note.auto_id
-        Note.auto_id += 1
+    def __init__(self, name, description, category, id=None):
+        self.id = id_generator.take('note', id)
         self.name = name
         self.description = description
         self.category = category
-        self.category.notes.append(self)
         self.reader = None
-        super().__init__()
+
+    def clone(self):
+        new_note = super().clone()
+        new_note.id = id_generator.next_id('note')
+        return new_note
+
+    def get_observers(self):
+        # Наблюдатели типа заметки и её категории.
+        return super().get_observers() + list(self.category.observers)
 
     def add_reader(self, reader: Reader):
+        if self.reader is not None and self.reader is not reader:
+            self.reader.notes.discard(self)
         self.reader = reader
         reader.notes.append(self)
         self.notify()
@@ -68,36 +426,83 @@ class Note(NotePrototype, Subject):
 
 
 class DatabaseNote(Note):
-    pass
+    __slots__ = ()
 
 class FileSystemNote(Note):
-    pass
+    __slots__ = ()
 
 class CommonNote(Note):
-    pass
+    __slots__ = ()
 
 class ObjectOrientedNote(Note):
-    pass
+    __slots__ = ()
 
 class PatternNote(Note):
-    pass
+    __slots__ = ()
 
 # Категория
 class Category:
-    auto_id = 1
+    __slots__ = ('id', 'name', 'category', 'children', 'notes', 'lineage', 'path', 'subtree_notes', 'observers')
+    storage_table = 'categories'
 
-    def __init__(self, name, category):
-        self.id = Category.auto_id
-        Category.auto_id += 1
+    def __init__(self, name, category, id=None):
+        self.id = id_generator.take('category', id)
         self.name = name
+        # Родительская категория.
         self.category = category
-        self.notes = []
+        self.children = IdCollection()
+        self.notes = IdCollection(orderings=NAME_ORDERINGS)
+        # Материализованный путь: цепочка категорий от корня до текущей.
+        if category:
+            self.lineage = category.lineage + (self,)
+            category.children.append(self)
+        else:
+            self.lineage = (self,)
+        self.path = '/'.join(str(item.id) for item in self.lineage)
+        # Число заметок в поддереве, поддерживается инкрементально.
+        self.subtree_notes = 0
+        # Наблюдатели за всеми заметками категории.
+        self.observers = ()
+
+    def attach(self, observer):
+        if observer not in self.observers:
+            self.observers += (observer,)
+
+    @property
+    def depth(self):
+        return len(self.lineage) - 1
+
+    def add_note(self, note):
+        if note not in self.notes:
+            self.notes.append(note)
+            for item in self.lineage:
+                item.subtree_notes += 1
+
+    def remove_note(self, note):
+        if note in self.notes:
+            self.notes.remove(note)
+            for item in self.lineage:
+                item.subtree_notes -= 1
 
     def notes_count(self):
-        result = len(self.notes)
-        if self.category:
-            result += self.category.notes_count()
-        return result
+        return self.subtree_notes
+
+    def breadcrumbs(self):
+        return self.lineage
+
+    def is_ancestor_of(self, other):
+        return other.path == self.path or other.path.startswith(f'{self.path}/')
+
+    def iter_subtree(self):
+        # Обход поддерева без рекурсии.
+        stack = [self]
+        while stack:
+            item = stack.pop()
+            yield item
+            stack.extend(reversed(list(item.children)))
+
+    def subtree_notes_list(self):
+        return [note for item in self.iter_subtree() for note in item.notes]
 
 # Порождающий паттерн Абстрактная фабрика - фабрика записок
 class NoteFactory:
@@ -111,94 +516,322 @@ class NoteFactory:
 
     # порождающий паттерн Фабричный метод
     @classmethod
-    def create(cls, type_, name, description, category):
-        return cls.types[type_](name, description, category)
+    def create(cls, type_, name, description, category, id=None):
+        return cls.types[type_](name, description, category, id)
+
+class Versions:
+    """
+    Счётчики изменений: общий ('global') и по объектам (('category', id), ('reader', id), ('note', id)).
+    Каждое изменение получает следующий номер общей последовательности,
+    поэтому номер однозначно определяет состояние, а время - Last-Modified.
+    """
+
+    def __init__(self):
+        self.sequence = count(1)
+        self.started = time.time()
+        self.stamps = {}
+        self.lock = threading.Lock()
+
+    def touch(self, *keys):
+        with self.lock:
+            stamp = (next(self.sequence), time.time())
+            self.stamps['global'] = stamp
+            for key in keys:
+                self.stamps[key] = stamp
+
+    def discard(self, *keys):
+        # Счётчики удалённых объектов больше не нужны: без этого словарь растёт с каждым объектом.
+        with self.lock:
+            for key in keys:
+                self.stamps.pop(key, None)
+
+    def get(self, key='global'):
+        """
+        :return: (номер изменения, время изменения)
+        """
+        return self.stamps.get(key) or (0, self.started)
+
 
 # Основной интерфейс проекта
+def synchronized(method):
+    # Метод Engine выполняется под его блокировкой: изменения из разных потоков
+    # сервера не перемешиваются.
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
 class Engine:
-    def __init__(self):
-        self.readers = []
-        self.editors = []
-        self.notes = []
-        self.categories = []
+    def __init__(self, storage=None):
+        # Блокировка изменений и составных чтений (RLock: методы вызывают друг друга).
+        self.lock = threading.RLock()
+        # Коллекции в памяти - кеш для чтения перед хранилищем.
+        self.readers = IdCollection(orderings=NAME_ORDERINGS)
+        self.editors = IdCollection()
+        self.notes = IdCollection(orderings=NOTE_ORDERINGS)
+        self.categories = IdCollection(orderings=NAME_ORDERINGS)
+        self.storage = storage or MemoryStorage()
+        self._local = threading.local()
+        self.versions = Versions()
+        self.search_index = SearchIndex()
+
+    def transaction(self):
+        """
+        Изменения внутри with site.transaction() пишутся в хранилище
+        одной транзакцией при выходе из внешнего блока.
+        """
+        unit_of_work = getattr(self._local, 'unit_of_work', None)
+        if unit_of_work is None:
+            unit_of_work = UnitOfWork(self.storage, id_generator.get_state)
+            self._local.unit_of_work = unit_of_work
+        return unit_of_work
+
+    @synchronized
+    def load(self):
+        # Наполняем кеш сохранённым состоянием.
+        state = self.storage.load()
+        if not state:
+            return
+        id_generator.set_state(state['counters'])
+        note_classes = {cls.__name__: cls for cls in (Note, *NoteFactory.types.values())}
+        user_classes = {cls.__name__: cls for cls in UserFactory.types.values()}
+
+        for id, name, parent_id in state['categories']:
+            parent = self.categories.get(parent_id) if parent_id else None
+            self.categories.append(self.create_category(name, parent, id=id))
+
+        for id, class_name, name in state['users']:
+            user = user_classes[class_name](name, id)
+            if isinstance(user, Reader):
+                self.readers.append(user)
+            else:
+                self.editors.append(user)
+
+        for id, class_name, name, description, category_id, reader_id in state['notes']:
+            note = note_classes[class_name](name, description, self.categories.get(category_id), id)
+            note.reader = self.readers.get(reader_id) if reader_id else None
+            self._index_note(note)
 
     @staticmethod
-    def create_user(type_, name):
-        return UserFactory.create(type_, name)
+    def create_user(type_, name, id=None):
+        return UserFactory.create(type_, name, id)
 
-    def find_note_by_id(self, id):
-        for item in self.notes:
-            print('item', item.id)
-            if item.id == id:
-                return item
-        raise Exception(f'Нет заметки с id = {id}')
+    @staticmethod
+    def check_new_id(collection, obj):
+        # Занятый id - ошибка: новый объект не должен подменять существующий.
+        existing = collection.get(obj.id)
+        if existing is not None and existing is not obj:
+            raise ValueError(f'Объект с id = {obj.id} уже существует')
+
+    @synchronized
+    def add_reader(self, reader):
+        self.check_new_id(self.readers, reader)
+        with self.transaction() as unit_of_work:
+            self.readers.append(reader)
+            unit_of_work.register_undo(lambda: self.readers.discard(reader))
+            unit_of_work.register_new(reader)
+        self.versions.touch(('reader', reader.id))
+
+    def category_keys(self, category):
+        # Изменение заметок категории меняет и счётчики её предков.
+        return [('category', item.id) for item in category.lineage] if category is not None else []
 
-    def get_new_note_id(self):
-        max_id = 1
-        for note in self.notes:
-            if note.id > max_id:
-                max_id = note.id
+    def get_reader_by_id(self, id):
+        return self.readers.get(id)
+
+    @synchronized
+    def del_reader_by_id(self, id):
+        with self.transaction() as unit_of_work:
+            self.clear_notes_reader(id)
+            reader = self.readers.pop(id)
+            if reader:
+                unit_of_work.register_undo(lambda: self.readers.append(reader))
+                unit_of_work.register_removed(reader)
+        self.versions.touch()
+        self.versions.discard(('reader', id))
 
-        for item in self.categories:
-            for note in item.notes:
-                if note.id > max_id:
-                    max_id = note.id
+    def find_note_by_id(self, id):
+        note = self.notes.get(id)
+        if note is None:
+            raise Exception(f'Нет заметки с id = {id}')
+        return note
 
-        return max_id + 1
+    @staticmethod
+    def get_new_note_id():
+        return id_generator.next_id('note')
+
+    def _index_note(self, note):
+        # Заметка попадает во все индексы сразу.
+        self.notes.append(note)
+        note.category.add_note(note)
+        if note.reader:
+            note.reader.notes.append(note)
+        self.search_index.add(note)
+
+    def _unindex_note(self, note):
+        self.notes.discard(note)
+        note.category.remove_note(note)
+        if note.reader:
+            note.reader.notes.discard(note)
+        self.search_index.remove(note)
 
+    @staticmethod
+    def _restore_reader(note, reader):
+        # Отмена перепривязки: заметка возвращается прежнему читателю.
+        if note.reader is not None:
+            note.reader.notes.discard(note)
+        note.reader = reader
+        if reader is not None:
+            reader.notes.append(note)
+
+    @synchronized
+    def add_note(self, note):
+        self.check_new_id(self.notes, note)
+        with self.transaction() as unit_of_work:
+            self._index_note(note)
+            unit_of_work.register_undo(lambda: self._unindex_note(note))
+            unit_of_work.register_new(note)
+        self.touch_note(note)
+
+    def touch_note(self, note, *keys):
+        keys = [*keys, ('note', note.id), *self.category_keys(note.category)]
+        if note.reader:
+            keys.append(('reader', note.reader.id))
+        self.versions.touch(*keys)
+
+    def copy_note(self, note, name=None):
+        # Копия регистрируется в настоящей категории один раз, в add_note.
+        new_note = note.clone()
+        if name is not None:
+            new_note.name = name
+        self.add_note(new_note)
+        return new_note
+
+    @synchronized
+    def copy_notes(self, ids, prefix='copy_'):
+        new_notes = []
+        with self.transaction():
+            for id in ids:
+                note = self.find_note_by_id(id)
+                new_notes.append(self.copy_note(note, f'{prefix}{note.name}'))
+        return new_notes
+
+    @synchronized
     def del_note_by_id(self, id):
-        for item in self.notes:
-            if item.id == id:
-                self.notes.remove(item)
-
-        for item in self.categories:
-            for note in item.notes:
-                if note.id == id:
-                    item.notes.remove(note)
-
+        note = self.notes.get(id)
+        if note is None:
+            return
+        with self.transaction() as unit_of_work:
+            self._unindex_note(note)
+            unit_of_work.register_undo(lambda: self._index_note(note))
+            unit_of_work.register_removed(note)
+        self.touch_note(note)
+        self.versions.discard(('note', note.id))
+
+    @synchronized
     def clear_notes_reader(self, reader_id):
-        for item in self.notes:
-            if item.reader:
-                if item.reader.id == reader_id:
-                    item.reader = None
-
-        for item in self.categories:
-            for note in item.notes:
-                if note.reader:
-                    if note.reader.id == reader_id:
+        # Обходим только заметки этого читателя.
+        reader = self.readers.get(reader_id)
+        if reader is None:
+            return
+        keys = [('reader', reader_id)]
+        with self.transaction() as unit_of_work:
+            for note in reader.notes:
+                unit_of_work.register_undo(lambda note=note: self._restore_reader(note, reader))
+                note.reader = None
+                unit_of_work.register_dirty(note)
+                keys.append(('note', note.id))
+                keys.extend(self.category_keys(note.category))
+            reader.notes.clear()
+        self.versions.touch(*keys)
+
+    @synchronized
+    def link_notes_reader(self, reader, note_ids, scope_ids=None):
+        """
+        Перепривязка заметок к читателю одной транзакцией.
+        :param reader: читатель
+        :param note_ids: id заметок, которые должны быть связаны с читателем
+        :param scope_ids: id заметок, связи которых можно снять (None - все)
+        """
+        keys = [('reader', reader.id)]
+        with self.transaction() as unit_of_work:
+            if scope_ids is None:
+                self.clear_notes_reader(reader.id)
+            else:
+                for note_id in scope_ids:
+                    note = reader.notes.get(note_id)
+                    if note:
+                        unit_of_work.register_undo(lambda note=note: self._restore_reader(note, reader))
                         note.reader = None
-
-    def get_reader_by_id(self, id):
-            for item in self.readers:
-                if item.id == id:
-                    return item
+                        reader.notes.discard(note)
+                        unit_of_work.register_dirty(note)
+                        keys.append(('note', note.id))
+                        keys.extend(self.category_keys(note.category))
+            for note_id in note_ids:
+                note = self.notes.get(note_id)
+                if note:
+                    if note.reader is not None and note.reader is not reader:
+                        keys.append(('reader', note.reader.id))
+                    unit_of_work.register_undo(
+                        lambda note=note, previous=note.reader: self._restore_reader(note, previous))
+                    note.add_reader(reader)
+                    unit_of_work.register_dirty(note)
+                    keys.append(('note', note.id))
+                    keys.extend(self.category_keys(note.category))
+        self.versions.touch(*keys)
 
     @staticmethod
-    def create_note(type_, name, description, category):
-        return NoteFactory.create(type_, name, description, category)
+    def create_note(type_, name, description, category, id=None):
+        return NoteFactory.create(type_, name, description, category, id)
 
     def get_note_by_name(self, name):
-        for item in self.notes:
-            if item.name == name:
+        # Кандидаты - из индекса по словам названия, затем точное сравнение.
+        tokens = tokenize(name)
+        if not tokens:
+            for item in self.notes:
+                if item.name == name:
+                    return item
+            return None
+        for id in self.search_index.name_candidates(set(tokens)):
+            item = self.notes.get(id)
+            if item is not None and item.name == name:
                 return item
         return None
 
-    @staticmethod
-    def decode_value(val):
-        val_b = bytes(val.replace('%', '=').replace("+", " "), 'UTF-8')
-        val_decode_str = quopri.decodestring(val_b)
-        return val_decode_str.decode('UTF-8')
+    def search_notes(self, query, category=None, offset=0, limit=20):
+        """
+        Полнотекстовый поиск заметок.
+        :param category: искать только в этой категории и её подкатегориях
+        :return: (заметки страницы, есть ли следующая страница)
+        """
+        accept = None
+        if category is not None:
+            def accept(id):
+                note = self.notes.get(id)
+                return note is not None and category in note.category.lineage
+        ids, has_next = self.search_index.search(query, offset, limit, accept)
+        return [self.notes.get(id) for id in ids], has_next
 
     @staticmethod
-    def create_category(name, category=None):
-        return Category(name, category)
+    def create_category(name, category=None, id=None):
+        return Category(name, category, id)
+
+    @synchronized
+    def add_category(self, category):
+        self.check_new_id(self.categories, category)
+        with self.transaction() as unit_of_work:
+            self.categories.append(category)
+            unit_of_work.register_undo(lambda: self.categories.discard(category))
+            unit_of_work.register_new(category)
+        self.versions.touch(*self.category_keys(category))
 
     def find_category_by_id(self, id):
-        for item in self.categories:
-            print('item', item.id)
-            if item.id == id:
-                return item
-        raise Exception(f'Нет категории с id = {id}')
+        category = self.categories.get(id)
+        if category is None:
+            raise Exception(f'Нет категории с id = {id}')
+        return category
 
 # Порождающий паттерн Синглтон.
 class SingletonByName(type):
@@ -208,10 +841,7 @@ class SingletonByName(type):
         cls.__instance = {}
 
     def __call__(cls, *args, **kwargs):
-        if args:
-            name = args[0]
-        if kwargs:
-            name = kwargs['name']
+        name = args[0] if args else kwargs['name']
 
         if name in cls.__instance:
             return cls.__instance[name]
@@ -220,12 +850,66 @@ class SingletonByName(type):
             return cls.__instance[name]
 
 
-class Logger(metaclass=SingletonByName):
+# Уровни логирования.
+DEBUG, INFO, WARNING, ERROR, OFF = 10, 20, 30, 40, 100
+LEVEL_NAMES = {'DEBUG': DEBUG, 'INFO': INFO, 'WARNING': WARNING, 'ERROR': ERROR, 'OFF': OFF}
+
+_default_writer = None
+_default_writer_lock = threading.Lock()
+
+
+def get_default_writer():
+    # Общий фоновый писатель: консоль или файл из настроек, создаётся при первой записи.
+    global _default_writer
+    with _default_writer_lock:
+        if _default_writer is None:
+            _default_writer = QueueWriter(FileWriter(LOG_FILE) if LOG_FILE else ConsoleWriter())
+        return _default_writer
 
-    def __init__(self, name, writer=ConsoleWriter()):
+
+class Logger(metaclass=SingletonByName):
+    """
+    Логгер с уровнями. Запись ниже уровня отсекается одним сравнением,
+    до форматирования строки; остальные уходят фоновому писателю.
+    :param writer: QueueWriter или синхронный писатель с методом write (по умолчанию - общий QueueWriter)
+    :param sample: писать одну из sample отладочных записей
+    """
+
+    def __init__(self, name, writer=None, level=None, sample=LOG_DEBUG_SAMPLE):
         self.name = name
         self.writer = writer
+        self.level = LEVEL_NAMES[(level or LOG_LEVEL).upper()] if not isinstance(level, int) else level
+        self.sample = max(1, sample)
+        self.counter = count()
+
+    def is_enabled(self, level):
+        return level >= self.level
+
+    def emit(self, level, message, args):
+        writer = self.writer
+        if writer is None:
+            writer = self.writer = get_default_writer()
+        record = (time.time(), level, self.name, message, args)
+        if isinstance(writer, QueueWriter):
+            writer.put(record)
+        else:
+            writer.write(QueueWriter.format(record))
+
+    def debug(self, message, *args):
+        if self.level <= DEBUG and (self.sample == 1 or next(self.counter) % self.sample == 0):
+            self.emit('DEBUG', message, args)
+
+    def info(self, message, *args):
+        if self.level <= INFO:
+            self.emit('INFO', message, args)
+
+    def warning(self, message, *args):
+        if self.level <= WARNING:
+            self.emit('WARNING', message, args)
+
+    def error(self, message, *args):
+        if self.level <= ERROR:
+            self.emit('ERROR', message, args)
 
     def log(self, text):
-        text = f'log---> {text}'
-        self.writer.write(text)
+        self.info(text)
@@ -1,5 +1,10 @@
-from lite_framework.main import LiteFramework
-from lite_framework.settings import HOST, PORT
+import sys
+
+from lite_framework import asgi_server
+from lite_framework.main import LiteFramework, AsgiApplication
+from lite_framework.server import serve
+from lite_framework.settings import HOST, PORT, SERVER_MODE
+from lite_framework.templator import warm_up
 from urls import fronts
 from wsgiref.simple_server import make_server
 
@@ -7,6 +12,14 @@ from views import routes
 
 application = LiteFramework(routes, fronts)
 
-with make_server(HOST, PORT, application) as httpd:
-    print(f"Starting server http://{HOST}:{PORT}")
-    httpd.serve_forever()
+# Компилируем шаблоны до первого запроса.
+warm_up()
+
+if SERVER_MODE == 'asgi' or '--asgi' in sys.argv:
+    asgi_server.serve(AsgiApplication(routes, fronts), HOST, PORT)
+elif SERVER_MODE == 'production' or '--production' in sys.argv:
+    serve(application, HOST, PORT)
+else:
+    with make_server(HOST, PORT, application) as httpd:
+        print(f"Starting server http://{HOST}:{PORT}")
+        httpd.serve_forever()
@@ -0,0 +1,86 @@
+import asyncio
+import unittest
+
+from lite_framework.asgi_server import AsgiServer, logger
+
+
+async def raising_app(scope, receive, send):
+    raise RuntimeError('ошибка приложения')
+
+
+async def raising_body_app(scope, receive, send):
+    await send({'type': 'http.response.start', 'status': 200, 'headers': [(b'content-type', b'text/plain')]})
+    await send({'type': 'http.response.body', 'body': b'first', 'more_body': True})
+    raise RuntimeError('ошибка в теле')
+
+
+async def ok_app(scope, receive, send):
+    await send({'type': 'http.response.start', 'status': 200, 'headers': [(b'content-length', b'2')]})
+    await send({'type': 'http.response.body', 'body': b'ok'})
+
+
+class ListWriter(list):
+    # Синхронный писатель логов для проверки записей.
+
+    def write(self, line):
+        self.append(line)
+
+
+class AsgiServerErrorTest(unittest.TestCase):
+
+    def setUp(self):
+        # Трассировки ошибок приложения в выводе тестов не нужны - собираем их в список.
+        self.log, self.writer = ListWriter(), logger.writer
+        logger.writer = self.log
+
+    def tearDown(self):
+        logger.writer = self.writer
+
+    def exchange(self, application, requests=1):
+        """
+        Запросы по одному соединению.
+        :return: всё, что сервер прислал до закрытия соединения
+        """
+        async def run():
+            server = AsgiServer(application, '127.0.0.1', 0)
+            listener = await asyncio.start_server(server.handle_connection, '127.0.0.1', 0)
+            port = listener.sockets[0].getsockname()[1]
+            try:
+                reader, writer = await asyncio.open_connection('127.0.0.1', port)
+                # Последний запрос просит закрыть соединение.
+                writer.write(b'GET / HTTP/1.1\r\nHost: test\r\n\r\n' * (requests - 1) +
+                             b'GET / HTTP/1.1\r\nHost: test\r\nConnection: close\r\n\r\n')
+                await writer.drain()
+                data = await asyncio.wait_for(reader.read(), 5)
+                writer.close()
+                return data
+            finally:
+                listener.close()
+                await listener.wait_closed()
+        return asyncio.run(run())
+
+    def test_exception_before_start_is_500(self):
+        data = self.exchange(raising_app, requests=2)
+        self.assertTrue(data.startswith(b'HTTP/1.1 500 Internal Server Error\r\n'))
+        self.assertIn(b'Connection: close', data)
+        # После 500 соединение закрыто, второй запрос не обрабатывается.
+        self.assertEqual(data.count(b'HTTP/1.1'), 1)
+        # Ошибка записана в лог сервера вместе с трассировкой.
+        self.assertEqual(len(self.log), 1)
+        self.assertIn('ERROR server', self.log[0])
+        self.assertIn("RuntimeError: ошибка приложения", self.log[0])
+
+    def test_exception_after_start_closes_connection(self):
+        data = self.exchange(raising_body_app, requests=2)
+        self.assertTrue(data.startswith(b'HTTP/1.1 200 OK\r\n'))
+        # Ответ оборван: нет завершающего пустого куска chunked.
+        self.assertFalse(data.endswith(b'0\r\n\r\n'))
+        self.assertEqual(data.count(b'HTTP/1.1'), 1)
+
+    def test_ok_keeps_connection(self):
+        data = self.exchange(ok_app, requests=2)
+        self.assertEqual(data.count(b'HTTP/1.1 200 OK'), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
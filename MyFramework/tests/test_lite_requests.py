@@ -0,0 +1,93 @@
+import io
+import unittest
+
+from lite_framework.lite_requests import GetRequests, PostRequests, RequestError, parse_header, parse_query
+
+
+class ParseHeaderTest(unittest.TestCase):
+
+    def test_semicolon_inside_quotes(self):
+        self.assertEqual(parse_header('form-data; name="file"; filename="a;b.txt"; size=3'),
+                         ('form-data', {'name': 'file', 'filename': 'a;b.txt', 'size': '3'}))
+
+    def test_plain_and_escaped_values(self):
+        self.assertEqual(parse_header('Multipart/Form-Data; boundary=abc'),
+                         ('multipart/form-data', {'boundary': 'abc'}))
+        self.assertEqual(parse_header(r'form-data; name="say \"hi\""'),
+                         ('form-data', {'name': 'say "hi"'}))
+        self.assertEqual(parse_header('text/plain'), ('text/plain', {}))
+
+    def test_multipart_filename_with_semicolon(self):
+        body = (b'--xyz\r\n'
+                b'Content-Disposition: form-data; name="upload"; filename="a;b.txt"\r\n'
+                b'Content-Type: text/plain\r\n\r\n'
+                b'content\r\n'
+                b'--xyz\r\n'
+                b'Content-Disposition: form-data; name="title"\r\n\r\n'
+                b'value\r\n'
+                b'--xyz--\r\n')
+        environ = {
+            'REQUEST_METHOD': 'POST',
+            'CONTENT_TYPE': 'multipart/form-data; boundary="xyz"',
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.input': io.BytesIO(body),
+        }
+        data = PostRequests().get_request_params(environ)
+        self.assertEqual(data['upload'].filename, 'a;b.txt')
+        self.assertEqual(data['upload'].read(), b'content')
+        self.assertEqual(data['title'], 'value')
+
+
+class ParseQueryTest(unittest.TestCase):
+
+    @staticmethod
+    def post(body: bytes):
+        environ = {
+            'REQUEST_METHOD': 'POST',
+            'CONTENT_TYPE': 'application/x-www-form-urlencoded',
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.input': io.BytesIO(body),
+        }
+        return PostRequests().get_request_params(environ)
+
+    def test_repeated_keys(self):
+        data = parse_query('id=1&id=2&name=a')
+        self.assertEqual(data['id'], '2')
+        self.assertEqual(data.getlist('id'), ['1', '2'])
+        self.assertEqual(data.getlist('name'), ['a'])
+        self.assertEqual(data.getlist('missing'), [])
+
+    def test_equals_inside_value(self):
+        self.assertEqual(parse_query('expr=a=b&eq=%3D=&empty=&flag'),
+                         {'expr': 'a=b', 'eq': '==', 'empty': '', 'flag': ''})
+
+    def test_plus_and_percent(self):
+        self.assertEqual(parse_query('q=a+b%2Bc&k%20ey=%D0%9F'), {'q': 'a b+c', 'k ey': 'П'})
+
+    def test_broken_percent(self):
+        self.assertEqual(parse_query('a=100%&b=%zz&c=%D0'), {'a': '100%', 'b': '%zz', 'c': '\ufffd'})
+
+    def test_non_ascii_body(self):
+        body = 'name=Привет&encoded=%D0%9F%D1%80%D0%B8&mixed=Пр%D0%B8+вет'.encode('utf-8')
+        self.assertEqual(self.post(body), {'name': 'Привет', 'encoded': 'При', 'mixed': 'При вет'})
+
+    def test_non_ascii_query_string(self):
+        # Сервер по PEP 3333 передаёт байты строки запроса как latin-1.
+        query = 'name=Привет&q=%D0%9F'.encode('utf-8').decode('latin-1')
+        self.assertEqual(GetRequests.get_request_params({'QUERY_STRING': query}), {'name': 'Привет', 'q': 'П'})
+
+    def test_field_count_limit(self):
+        self.assertEqual(len(parse_query('&'.join(f'k{n}=v' for n in range(5)), max_fields=5)), 5)
+        with self.assertRaises(RequestError) as context:
+            parse_query('&'.join(f'k{n}=v' for n in range(6)), max_fields=5)
+        self.assertTrue(context.exception.status.startswith('413'))
+
+    def test_field_size_limit(self):
+        self.assertEqual(parse_query('a=12345678&b=1', max_field_size=10), {'a': '12345678', 'b': '1'})
+        with self.assertRaises(RequestError) as context:
+            parse_query('a=123456789&b=1', max_field_size=10)
+        self.assertTrue(context.exception.status.startswith('413'))
+
+
+if __name__ == '__main__':
+    unittest.main()
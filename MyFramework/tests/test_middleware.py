@@ -0,0 +1,68 @@
+import time
+import unittest
+from email.utils import formatdate
+
+from lite_framework.compression import Compressor
+from lite_framework.lite_requests import Request
+from lite_framework.middleware import Chain, conditional_response
+
+
+def make_request(**headers):
+    environ = {'REQUEST_METHOD': 'GET', 'PATH_INFO': '/', 'QUERY_STRING': ''}
+    environ.update(headers)
+    return Request(environ)
+
+
+class ConditionalResponseTest(unittest.TestCase):
+
+    def test_last_modified_is_rounded_up(self):
+        request = make_request()
+        conditional_response(request, (1, 1000.2))
+        self.assertEqual(dict(request.response_headers)['Last-Modified'], formatdate(1001, usegmt=True))
+
+    def test_second_change_in_same_second_is_not_304(self):
+        # Клиент получил Last-Modified первого изменения; второе в ту же секунду - позже.
+        request = make_request(HTTP_IF_MODIFIED_SINCE=formatdate(1000, usegmt=True))
+        self.assertIsNone(conditional_response(request, (2, 1000.7)))
+        request = make_request(HTTP_IF_MODIFIED_SINCE=formatdate(1001, usegmt=True))
+        self.assertEqual(conditional_response(request, (2, 1000.7)), ('304 Not Modified', ''))
+
+    def test_no_last_modified_until_second_ends(self):
+        request = make_request()
+        conditional_response(request, (1, time.time() + 5))
+        headers = dict(request.response_headers)
+        self.assertNotIn('Last-Modified', headers)
+        self.assertIn('ETag', headers)
+
+
+class View:
+
+    def validators(self, request):
+        return 1, 1000.0
+
+    def __call__(self, request):
+        return '200 OK', 'x' * 1000
+
+
+class NotModifiedVaryTest(unittest.TestCase):
+
+    def test_304_keeps_vary(self):
+        chain = Chain(View(), [], compressor=Compressor())
+        request = make_request(HTTP_ACCEPT_ENCODING='gzip')
+        chain(request)
+        etag = dict(request.response_headers)['ETag']
+        request = make_request(HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=etag)
+        code, body = chain(request)
+        self.assertTrue(code.startswith('304'))
+        self.assertIn(('Vary', 'Accept-Encoding'), request.response_headers)
+
+    def test_no_vary_without_compression(self):
+        chain = Chain(View(), [])
+        request = make_request(HTTP_IF_MODIFIED_SINCE=formatdate(1000, usegmt=True))
+        code, body = chain(request)
+        self.assertTrue(code.startswith('304'))
+        self.assertNotIn('Vary', dict(request.response_headers))
+
+
+if __name__ == '__main__':
+    unittest.main()
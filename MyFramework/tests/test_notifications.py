@@ -0,0 +1,59 @@
+import os
+import time
+import unittest
+
+from patterns.behavioral_patterns import LocalTransport, NotificationBus, Notifier
+
+
+class NotificationBusTest(unittest.TestCase):
+
+    def setUp(self):
+        self.transport = LocalTransport()
+        self.notifier = Notifier(transport=self.transport)
+
+    def test_batch_collapses_repeated_events(self):
+        bus = NotificationBus(interval=60)
+        bus.publish(self.notifier, 1, 'reader', 'first', 10)
+        bus.publish(self.notifier, 1, 'reader', 'first', 10)
+        bus.publish(self.notifier, 1, 'reader', 'second', 11)
+        bus.publish(self.notifier, 2, 'other', 'first', 10)
+        bus.close()
+        self.assertEqual(sorted(self.transport.messages), [
+            ('', 'other', Notifier.format(['first'])),
+            ('', 'reader', Notifier.format(['first', 'second'])),
+        ])
+
+    def test_starts_on_first_event(self):
+        bus = NotificationBus(interval=0.01)
+        self.assertIsNone(bus.thread)
+        bus.publish(self.notifier, 1, 'reader', 'note', 1)
+        self.assertTrue(bus.thread.is_alive())
+        bus.close()
+        self.assertEqual(len(self.transport.messages), 1)
+
+    @unittest.skipUnless(hasattr(os, 'fork'), 'нужен fork')
+    def test_delivers_in_forked_child(self):
+        bus = NotificationBus(interval=0.01)
+        # Поток шины запущен до fork, как при импорте views.
+        bus.publish(self.notifier, 1, 'parent', 'note', 1)
+        read, write = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            transport = LocalTransport()
+            bus.publish(Notifier(transport=transport), 2, 'child', 'note', 2)
+            deadline = time.monotonic() + 5
+            while not transport.messages and time.monotonic() < deadline:
+                time.sleep(0.01)
+            os.write(write, str(len(transport.messages)).encode())
+            os._exit(0)
+        os.close(write)
+        delivered = os.read(read, 16)
+        os.close(read)
+        os.waitpid(pid, 0)
+        bus.close()
+        self.assertEqual(delivered, b'1')
+        self.assertEqual(self.transport.messages, [('', 'parent', Notifier.format(['note']))])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+
+from patterns.behavioral_patterns import QuerySet
+from patterns.сreational_patterns import IdCollection, NAME_ORDERINGS, Reader
+
+
+class CursorAfterDeleteTest(unittest.TestCase):
+
+    def setUp(self):
+        # Названия в порядке, обратном id: сортировка по имени не совпадает с порядком id.
+        self.readers = [Reader(name) for name in 'jihgfedcba']
+
+    def pages(self, collection, ordering, delete=None):
+        names = []
+        params = {'order': ordering}
+        while True:
+            queryset = QuerySet.from_params(collection, params, page_size=3)
+            names.extend(item.name for item in queryset)
+            cursor = queryset.next_cursor
+            if cursor is None:
+                return names
+            if delete is not None:
+                # Объект курсора удалён до запроса следующей страницы.
+                delete(list(queryset)[-1])
+                delete = None
+            params = {'order': ordering, 'after': str(cursor)}
+
+    def check(self, collection, remove):
+        names = self.pages(collection, 'name', delete=remove)
+        self.assertEqual(names, list('abcdefghij'))
+
+        descending = self.pages(collection, '-name')
+        self.assertEqual(descending, sorted(descending, reverse=True))
+        self.assertEqual(len(descending), len(set(descending)))
+
+    def test_index_cursor_survives_deleted_item(self):
+        collection = IdCollection(self.readers, orderings=NAME_ORDERINGS)
+        self.check(collection, collection.discard)
+
+    def test_list_cursor_survives_deleted_item(self):
+        collection = list(self.readers)
+        self.check(collection, collection.remove)
+
+    def test_cursor_contains_sort_key(self):
+        collection = IdCollection(self.readers, orderings=NAME_ORDERINGS)
+        queryset = QuerySet.from_params(collection, {'order': 'name'}, page_size=3)
+        last = list(queryset)[-1]
+        self.assertEqual(queryset.next_cursor, f'c:{last.id}')
+        self.assertEqual(QuerySet.parse_cursor(queryset.next_cursor), ('c', last.id))
+
+    def test_id_cursor_is_plain_id(self):
+        collection = IdCollection(self.readers, orderings=NAME_ORDERINGS)
+        queryset = QuerySet.from_params(collection, {}, page_size=3)
+        self.assertEqual(queryset.next_cursor, list(queryset)[-1].id)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import threading
+import unittest
+
+from patterns.сreational_patterns import Engine, Note
+
+
+class SearchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.site = Engine()
+        self.root = self.site.create_category('root')
+        self.site.add_category(self.root)
+        self.child = self.site.create_category('child', self.root)
+        self.site.add_category(self.child)
+        self.other = self.site.create_category('other')
+        self.site.add_category(self.other)
+
+    def add(self, name, description, category):
+        note = Note(name, description, category)
+        self.site.add_note(note)
+        return note
+
+    def test_multiple_terms_rank_and_page(self):
+        text = [self.add(f'note {number}', 'common text', self.root) for number in range(30)]
+        both = self.add('common text', 'common text', self.other)
+        half = self.add('common', 'text', self.child)
+        self.add('common', 'no match', self.root)
+
+        notes, has_next = self.site.search_notes('common text', limit=5)
+        self.assertEqual(notes, [both, half] + text[:3])
+        self.assertTrue(has_next)
+
+        notes, has_next = self.site.search_notes('text comm', offset=30, limit=5)
+        self.assertEqual(notes, text[28:])
+        self.assertFalse(has_next)
+
+    def test_category_filter_and_deleted_notes(self):
+        inside = self.add('common text', '', self.child)
+        self.add('common text', '', self.other)
+        removed = self.add('common text', '', self.root)
+        self.site.del_note_by_id(removed.id)
+
+        notes, has_next = self.site.search_notes('common text', category=self.root)
+        self.assertEqual((notes, has_next), ([inside], False))
+
+    def test_note_by_name_during_writes(self):
+        # Запись меняет тот же список id, по которому идёт поиск.
+        for number in range(500):
+            self.add(f'target other {number}', 'text', self.root)
+        target = self.add('target', 'text', self.root)
+        stop = threading.Event()
+
+        def write():
+            number = 0
+            while not stop.is_set():
+                note = self.add(f'target {number}', 'text', self.child)
+                self.site.del_note_by_id(note.id)
+                number += 1
+
+        writer = threading.Thread(target=write)
+        writer.start()
+        try:
+            for _ in range(300):
+                self.assertIs(self.site.get_note_by_name('target'), target)
+        finally:
+            stop.set()
+            writer.join()
+        self.assertIsNone(self.site.get_note_by_name('target 0'))
+
+
+if __name__ == '__main__':
+    unittest.main()
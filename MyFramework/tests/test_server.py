@@ -0,0 +1,147 @@
+import contextlib
+import http.client
+import os
+import socket
+import threading
+import unittest
+
+from lite_framework import middleware
+from lite_framework.server import ThreadPoolServer
+from lite_framework.settings import MAX_DRAIN_SIZE
+
+
+def raising_app(environ, start_response):
+    raise RuntimeError('ошибка приложения')
+
+
+def raising_body_app(environ, start_response):
+    start_response('200 OK', [('Content-Type', 'text/plain')])
+
+    def body():
+        yield b'first'
+        raise RuntimeError('ошибка в теле')
+    return body()
+
+
+def ok_app(environ, start_response):
+    start_response('200 OK', [('Content-Type', 'text/plain'), ('Content-Length', '2')])
+    return [b'ok']
+
+
+@contextlib.contextmanager
+def running(application):
+    server = ThreadPoolServer(('127.0.0.1', 0), application, threads=2)
+    # Трассировки ошибок приложения в выводе тестов не нужны.
+    server.handle_error = lambda request, client_address: None
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server.server_port
+    finally:
+        server.shutdown()
+        server.drain()
+        server.server_close()
+
+
+class ForkTest(unittest.TestCase):
+
+    @unittest.skipUnless(hasattr(os, 'fork'), 'нужен fork')
+    def test_child_gets_own_boot_id(self):
+        read, write = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.write(write, middleware.BOOT_ID.encode())
+            os._exit(0)
+        os.close(write)
+        child_boot_id = os.read(read, 64).decode()
+        os.close(read)
+        os.waitpid(pid, 0)
+        self.assertTrue(child_boot_id)
+        self.assertNotEqual(child_boot_id, middleware.BOOT_ID)
+
+
+class ServerErrorTest(unittest.TestCase):
+
+    def request(self, port):
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+        connection.request('GET', '/')
+        return connection, connection.getresponse()
+
+    def test_exception_before_headers_is_500(self):
+        with running(raising_app) as port:
+            connection, response = self.request(port)
+            response.read()
+            self.assertEqual(response.status, 500)
+            self.assertEqual(response.getheader('Connection'), 'close')
+            connection.close()
+            # Сервер продолжает обслуживать запросы.
+            connection, response = self.request(port)
+            self.assertEqual(response.status, 500)
+            connection.close()
+
+    def test_exception_after_headers_closes_connection(self):
+        with running(raising_body_app) as port:
+            connection, response = self.request(port)
+            self.assertEqual(response.status, 200)
+            with self.assertRaises(http.client.IncompleteRead):
+                response.read()
+            connection.close()
+
+    def test_ok_response(self):
+        with running(ok_app) as port:
+            connection, response = self.request(port)
+            self.assertEqual((response.status, response.read()), (200, b'ok'))
+            connection.close()
+
+
+class RequestBodyTest(unittest.TestCase):
+
+    def exchange(self, port, data):
+        # Ответ целиком: сервер закрывает соединение или перестаёт отвечать.
+        with socket.create_connection(('127.0.0.1', port), timeout=2) as sock:
+            sock.sendall(data)
+            chunks = []
+            try:
+                while True:
+                    chunk = sock.recv(65536)
+                    if not chunk:
+                        break
+                    chunks.append(chunk)
+            except TimeoutError:
+                pass
+        return b''.join(chunks)
+
+    def test_chunked_body_is_rejected(self):
+        with running(ok_app) as port:
+            response = self.exchange(port, b'POST / HTTP/1.1\r\nHost: x\r\nTransfer-Encoding: chunked\r\n\r\n'
+                                           b'3\r\nabc\r\n0\r\n\r\nGET / HTTP/1.1\r\nHost: x\r\n\r\n')
+        self.assertTrue(response.startswith(b'HTTP/1.1 411'))
+        self.assertIn(b'Connection: close', response)
+        # Хвост chunked-тела не разобран как следующий запрос.
+        self.assertEqual(response.count(b'HTTP/1.1 '), 1)
+
+    def test_bad_content_length(self):
+        for headers in (b'Content-Length: abc\r\n', b'Content-Length: -1\r\n',
+                        b'Content-Length: 2\r\nContent-Length: 5\r\n'):
+            with self.subTest(headers=headers), running(ok_app) as port:
+                response = self.exchange(port, b'POST / HTTP/1.1\r\nHost: x\r\n' + headers + b'\r\nokokok')
+                self.assertTrue(response.startswith(b'HTTP/1.1 400'))
+                self.assertIn(b'Connection: close', response)
+
+    def test_small_unread_body_keeps_connection(self):
+        with running(ok_app) as port:
+            response = self.exchange(port, b'POST / HTTP/1.1\r\nHost: x\r\nContent-Length: 5\r\n\r\nhello'
+                                           b'GET / HTTP/1.1\r\nHost: x\r\nConnection: close\r\n\r\n')
+        self.assertEqual(response.count(b'HTTP/1.1 200'), 2)
+
+    def test_large_unread_body_closes_connection(self):
+        with running(ok_app) as port:
+            length = MAX_DRAIN_SIZE + 1
+            response = self.exchange(port, b'POST / HTTP/1.1\r\nHost: x\r\n'
+                                           b'Content-Length: %d\r\n\r\n' % length)
+        self.assertTrue(response.startswith(b'HTTP/1.1 200'))
+        self.assertIn(b'Connection: close', response)
+
+
+if __name__ == '__main__':
+    unittest.main()
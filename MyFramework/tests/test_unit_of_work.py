@@ -0,0 +1,105 @@
+import threading
+import unittest
+
+from patterns.architectural_patterns import MemoryStorage
+from patterns.сreational_patterns import Engine, Note
+
+
+class FailingStorage(MemoryStorage):
+    # Хранилище, запись в которое можно сделать неудачной.
+
+    def __init__(self):
+        self.fail = False
+
+    def commit(self, new_objects, dirty_objects, removed_objects, counters):
+        if self.fail:
+            raise OSError('запись не удалась')
+
+
+class RollbackTest(unittest.TestCase):
+
+    def setUp(self):
+        self.storage = FailingStorage()
+        self.site = Engine(self.storage)
+        self.root = self.site.create_category('root')
+        self.site.add_category(self.root)
+        self.child = self.site.create_category('child', self.root)
+        self.site.add_category(self.child)
+        self.note = Note('linked note', 'text', self.child)
+        self.site.add_note(self.note)
+        self.other = Note('free note', 'text', self.child)
+        self.site.add_note(self.other)
+        self.reader = self.site.create_user('reader', 'reader')
+        self.site.add_reader(self.reader)
+        self.site.link_notes_reader(self.reader, [self.note.id])
+        self.storage.fail = True
+
+    def state(self):
+        site = self.site
+        return {
+            'notes': sorted(note.id for note in site.notes),
+            'child': sorted(note.id for note in self.child.notes),
+            'counts': (self.root.subtree_notes, self.child.subtree_notes),
+            'readers': sorted(reader.id for reader in site.readers),
+            'links': {note.id: note.reader and note.reader.id for note in site.notes},
+            'reader_notes': sorted(note.id for note in self.reader.notes),
+            'categories': sorted(category.id for category in site.categories),
+            'search': sorted(note.id for note in site.search_notes('note')[0]),
+        }
+
+    def assert_rolled_back(self, change):
+        before = self.state()
+        with self.assertRaises(OSError):
+            change()
+        self.assertEqual(self.state(), before)
+
+    def test_add_note(self):
+        self.assert_rolled_back(lambda: self.site.add_note(Note('new note', 'text', self.child)))
+
+    def test_delete_note(self):
+        self.assert_rolled_back(lambda: self.site.del_note_by_id(self.note.id))
+
+    def test_copy_notes(self):
+        self.assert_rolled_back(lambda: self.site.copy_notes([self.note.id, self.other.id]))
+
+    def test_link_reader(self):
+        self.assert_rolled_back(lambda: self.site.link_notes_reader(self.reader, [self.other.id]))
+        self.assert_rolled_back(lambda: self.site.link_notes_reader(self.reader, [], [self.note.id]))
+
+    def test_delete_reader(self):
+        self.assert_rolled_back(lambda: self.site.del_reader_by_id(self.reader.id))
+
+    def test_add_category(self):
+        self.assert_rolled_back(lambda: self.site.add_category(self.site.create_category('new', self.root)))
+
+
+class ConcurrencyTest(unittest.TestCase):
+
+    def test_parallel_changes_keep_indexes_consistent(self):
+        site = Engine()
+        category = site.create_category('root')
+        site.add_category(category)
+        reader = site.create_user('reader', 'reader')
+        site.add_reader(reader)
+
+        def work(number):
+            for step in range(200):
+                note = Note(f'note {number} {step}', 'text', category)
+                site.add_note(note)
+                site.link_notes_reader(reader, [note.id], [])
+                if step % 2:
+                    site.del_note_by_id(note.id)
+
+        threads = [threading.Thread(target=work, args=(number,)) for number in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(site.notes), 8 * 100)
+        self.assertEqual(category.subtree_notes, len(site.notes))
+        self.assertEqual(sorted(note.id for note in reader.notes), sorted(note.id for note in site.notes))
+        self.assertEqual(len(site.search_notes('note', limit=1000)[0]), len(site.notes))
+
+
+if __name__ == '__main__':
+    unittest.main()
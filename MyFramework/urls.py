@@ -1,13 +1,20 @@
 from datetime import date
 
+from lite_framework.middleware import cached_value
 from lite_framework.settings import SERVER_URL
 from views import Index, About, DeleteNote, CopyNote
 
 
+# Год меняется редко - вычисляем его не чаще раза в минуту.
+@cached_value(ttl=60)
+def current_year():
+    return date.today().year
+
+
 # front controller
 def secret_front(request):
     data = request.get('data', dict())
-    data['my_date'] = date.today().year
+    data['my_date'] = current_year()
     data['server_url'] = SERVER_URL
     request['data'] = data
 
@@ -17,4 +24,3 @@ def other_front(request):
     request['data'] = data
 
 fronts = [secret_front, other_front]
-
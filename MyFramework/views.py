@@ -1,17 +1,51 @@
-from lite_framework.settings import SERVER_URL
-from lite_framework.templator import render
-from patterns.behavioral_patterns import ListView, CreateView, DeleteView, BaseSerializer, EmailNotifier, SmsNotifier
+import json
+
+from lite_framework.cache import response_cache
+from lite_framework.main import on_shutdown
+from lite_framework.settings import SERVER_URL, DATABASE_PATH, API_PAGE_SIZE, API_MAX_PAGE_SIZE, SEARCH_PAGE_SIZE
+from lite_framework.templator import render, render_stream, get_environment
+from patterns.architectural_patterns import SqliteStorage
+from patterns.behavioral_patterns import ListView, CreateView, DeleteView, EmailNotifier, SmsNotifier, \
+    QuerySet, NotificationBus, JsonStream, NoteSchema, CategorySchema, ReaderSchema, ResultPage
 from patterns.structural_patterns import AppRoute, Debug
-from patterns.сreational_patterns import Engine, Logger, Note
+from patterns.сreational_patterns import Engine, Logger, Note, CommonNote
 
-site = Engine()
+site = Engine(SqliteStorage(DATABASE_PATH) if DATABASE_PATH else None)
+site.load()
 logger = Logger('main')
-email_notifier = EmailNotifier()
-sms_notifier = SmsNotifier()
+# Уведомления отправляются в фоне, по одному сообщению на читателя за интервал.
+notification_bus = NotificationBus()
+email_notifier = EmailNotifier(bus=notification_bus)
+sms_notifier = SmsNotifier(bus=notification_bus)
+# Недоставленные уведомления досылаются при остановке приложения.
+on_shutdown(notification_bus.close)
+
+# Версии объектов для ключей {% cache %} в шаблонах.
+get_environment().globals['version'] = lambda kind, id: site.versions.get((kind, id))[0]
+
+# Наблюдатели за заметками, создаваемыми через CreateNote.
+CommonNote.attach(email_notifier)
+CommonNote.attach(sms_notifier)
 
 routes = {}
 
 
+def get_page(collection, request):
+    # Страница коллекции по параметрам запроса (page, order, after).
+    return QuerySet.from_params(collection, request.get('request_params'))
+
+
+def find_category(value):
+    # Категория по id или по названию.
+    value = str(value)
+    if value.isdigit():
+        return site.categories.get(int(value))
+    for category in site.categories:
+        if category.name == value:
+            return category
+    return None
+
+
 # Контроллер - о проекте.
 @AppRoute(routes=routes, url='/about/')
 class About:
@@ -22,9 +56,13 @@ class About:
 
 
 # Контроллер - стартовая страница.
-@AppRoute(routes=routes, url='/')
+@AppRoute(routes=routes, url='/', cache_page=True)
 class Index:
 
+    def validators(self, request):
+        # Страница зависит от всех заметок: общий счётчик изменений.
+        return site.versions.get()
+
     @Debug(name='Index')
     def __call__(self, request):
         logger.log('Список заметок')
@@ -32,7 +70,7 @@ class Index:
         if len(site.notes) == 0:
             # Add test notes data.
             cat_1 = site.create_category('common', None)
-            site.categories.append(cat_1)
+            site.add_category(cat_1)
 
             note_test_1 = Note(name='map() function',
                                description='''
@@ -45,7 +83,7 @@ class Index:
                                        print(list(result))<br><br>
                                        # (('John', 'Jenny'), ('Charles', 'Christy'), ('Mike', 'Monica'))''',
                                category=cat_1)
-            site.notes.append(note_test_1)
+            site.add_note(note_test_1)
 
             note_test_2 = Note(name='zip() Function',
                                description='''
@@ -56,13 +94,22 @@ class Index:
                         
                                         # (('John', 'Jenny'), ('Charles', 'Christy'), ('Mike', 'Monica'))''',
                                category=cat_1)
-            site.notes.append(note_test_2)
+            site.add_note(note_test_2)
 
-        if request.get('note', None):
-            if request['note'] not in site.notes:
-                site.notes.append(request['note'])
+        note = request.get('note', None)
+        if note is not None:
+            # В форме категория - id или название; заметка добавляется через Engine.
+            category = find_category(note.category)
+            # Проверка и добавление - под блокировкой Engine, иначе два запроса добавят одну заметку дважды.
+            with site.lock:
+                existing = site.get_note_by_name(note.name)
+                if category is not None and not (existing and existing.description == note.description
+                                                 and existing.category is category):
+                    note.category = category
+                    site.add_note(note)
 
-        return '200 OK', render('index.html', notes_list=site.notes, data=request.get('data', None))
+        return '200 OK', render_stream('index.html', notes_list=get_page(site.notes, request),
+                                       data=request.get('data', None))
 
 
 # Контроллер - удалить заметку.
@@ -84,18 +131,22 @@ class DeleteNote:
                 category = site.find_category_by_id(int(category_id))
 
             return '200 OK', render('note-list.html', data=request.get('data', None),
-                                    objects_list=category.notes, name=category.name, id=category.id)
+                                    objects_list=get_page(category.notes, request), name=category.name, id=category.id)
         except KeyError:
             return '200 OK', 'No note have been added yet'
 
 
 # Контроллер - категории.
-@AppRoute(routes=routes, url='/category/')
+@AppRoute(routes=routes, url='/category/', cache_page=True)
 class Category:
 
+    def validators(self, request):
+        return site.versions.get()
+
     @Debug(name='Category')
     def __call__(self, request):
-        return '200 OK', render('category.html', data=request.get('data', None), category_list=site.categories)
+        return '200 OK', render('category.html', data=request.get('data', None),
+                                category_list=get_page(site.categories, request))
 
 
 # Контроллер - создать категорию.
@@ -106,11 +157,10 @@ class CreateCategory:
 
         if request['method'] == 'POST':
             # метод пост
-            print(request)
+            logger.debug('%s', request)
             data = request['data']
 
             name = data['category_name']
-            name = site.decode_value(name)
 
             category_id = data.get('category_id')
 
@@ -120,24 +170,36 @@ class CreateCategory:
 
             new_category = site.create_category(name, category)
 
-            site.categories.append(new_category)
+            site.add_category(new_category)
 
-            return '200 OK', render('category.html', data=request.get('data', None), category_list=site.categories)
+            return '200 OK', render('category.html', data=request.get('data', None),
+                                    category_list=get_page(site.categories, request))
         else:
             return '200 OK', render('create-category.html', data=request.get('data', None),
-                                    category_list=site.categories)
+                                    category_list=get_page(site.categories, request))
 
 
 # Контроллер - список заметок.
-@AppRoute(routes=routes, url='/note-list/')
+@AppRoute(routes=routes, url='/note-list/<int:id>/', cache_page=True)
+@AppRoute(routes=routes, url='/note-list/', cache_page=True)
 class NotesList:
+
+    def validators(self, request):
+        # Только заметки одной категории: счётчик этой категории.
+        params = request.get('path_params') or request.get('request_params') or {}
+        id = str(params.get('id', ''))
+        return site.versions.get(('category', int(id))) if id.isdigit() else None
+
     @Debug(name='NotesList')
     def __call__(self, request):
         logger.log('Список заметок')
         try:
-            category = site.find_category_by_id(int(request['request_params']['id']))
-            return '200 OK', render('note-list.html', data=request.get('data', None), objects_list=category.notes,
-                                    name=category.name, id=category.id)
+            # id категории - из адреса (/note-list/1/) или из параметров (?id=1).
+            params = request.get('path_params') or request['request_params']
+            category = site.find_category_by_id(int(params['id']))
+            return '200 OK', render_stream('note-list.html', data=request.get('data', None),
+                                           objects_list=get_page(category.notes, request), name=category.name,
+                                           id=category.id)
         except KeyError:
             return '200 OK', 'No courses have been added yet'
 
@@ -154,26 +216,17 @@ class CreateNote:
             data = request['data']
 
             name = data['note_name']
-            name = site.decode_value(name)
-
             description = data['description']
-            description = site.decode_value(description)
 
             category = None
             if self.category_id != -1:
                 category = site.find_category_by_id(int(self.category_id))
-                note_id = site.get_new_note_id()
                 note = site.create_note('common', name, description, category)
-                note.id = note_id
-
-                # Добавляем наблюдателей за заметкой
-                note.observers.append(email_notifier)
-                note.observers.append(sms_notifier)
 
-                site.notes.append(note)
+                site.add_note(note)
 
             return '200 OK', render('note-list.html', data=request.get('data', None),
-                                    objects_list=category.notes, name=category.name, id=category.id)
+                                    objects_list=get_page(category.notes, request), name=category.name, id=category.id)
 
         else:
             try:
@@ -199,37 +252,31 @@ class CopyNote:
 
         try:
             id = request_params['id']
-            # name = site.decode_value(name)
             old_note = site.find_note_by_id(int(id))
             if old_note:
-                new_name = f'copy_{old_note.name}'
-                new_id = site.get_new_note_id()
-                new_note = old_note.clone()
-                new_note.name = new_name
-                new_note.id = new_id
-                site.notes.append(new_note)
-
-                category = site.find_category_by_id(new_note.category.id)
-                category.notes.append(new_note)
+                new_note = site.copy_note(old_note, f'copy_{old_note.name}')
+                category = new_note.category
 
             return '200 OK', render('note-list.html', data=request.get('data', None),
-                                    objects_list=category.notes, name=category.name, id=category.id)
+                                    objects_list=get_page(category.notes, request), name=category.name, id=category.id)
 
         except KeyError:
             return '200 OK', 'No note have been added yet'
 
 
 # Контроллер - читатели заметок.
-@AppRoute(routes=routes, url='/reader-list/')
+@AppRoute(routes=routes, url='/reader-list/', cache_page=True)
 class ReaderListView(ListView, CreateView):
     queryset = site.readers
     template_name = 'reader-list.html'
 
+    def validators(self, request):
+        return site.versions.get()
+
     def create_obj(self, data: dict):
         name = data['reader_name']
-        name = site.decode_value(name)
         new_obj = site.create_user('reader', name)
-        site.readers.append(new_obj)
+        site.add_reader(new_obj)
 
 # Контроллер - удалить пользователя.
 @AppRoute(routes=routes, url='/delete-reader/')
@@ -240,9 +287,7 @@ class ReaderDeleteView(DeleteView):
     def delete_obj(self, params: dict):
         reader_id = params.get('id', None)
         if reader_id:
-            for reader in site.readers:
-                if reader.id == int(reader_id):
-                    site.readers.remove(reader)
+            site.del_reader_by_id(int(reader_id))
 
 # Контроллер - связь пользователя и заметки.
 @AppRoute(routes=routes, url='/link-reader/')
@@ -256,21 +301,18 @@ class UserNote:
                 data = request['data']
                 reader_id = data.get('link', None)
                 check_box_values = [int(v) for k, v in data.items() if 'note_checkbox_' in k]
+                # Заметки, показанные на странице формы: только их связи и меняем.
+                shown_values = [int(v) for k, v in data.items() if 'note_shown_' in k]
 
                 if reader_id:
                     reader_id = int(reader_id)
-                    site.clear_notes_reader(reader_id)
-
                     reader = site.get_reader_by_id(reader_id)
 
                     if reader:
-                        for note_id in check_box_values:
-                            for note in site.notes:
-                                if note.id == note_id:
-                                    note.add_reader(reader)
+                        site.link_notes_reader(reader, check_box_values, shown_values or None)
 
                     return '200 OK', render('link-reader.html', data=request.get('data', None),
-                                            reader=reader, notes_list=site.notes)
+                                            reader=reader, notes_list=get_page(site.notes, request))
             except KeyError:
                 return '200 OK', 'No reader have been added yet'
         else:
@@ -282,7 +324,7 @@ class UserNote:
                 if id:
                     reader = site.get_reader_by_id(int(id))
 
-                    notes_list = site.notes
+                    notes_list = get_page(site.notes, request)
 
                     return '200 OK', render('link-reader.html', data=request.get('data', None),
                                             reader=reader, notes_list=notes_list)
@@ -293,11 +335,99 @@ class UserNote:
             except KeyError:
                 return '200 OK', 'No reader have been added yet'
 
-@AppRoute(routes=routes, url='/api/')
+# JSON API: /api/ (заметки) и /api/notes/, /api/categories/, /api/readers/.
+# Параметры: fields=id,name - выбор полей, limit, after - курсор, page, order,
+# format=jsonl - выгрузка всей коллекции построчно.
+# JSON-ответу данные front controllers не нужны.
+@AppRoute(routes=routes, url='/api/<slug:resource>/', fronts=(), cache_page=True)
+@AppRoute(routes=routes, url='/api/', fronts=(), cache_page=True)
 class CourseApi:
+    resources = {
+        'notes': (NoteSchema, lambda: site.notes),
+        'categories': (CategorySchema, lambda: site.categories),
+        'readers': (ReaderSchema, lambda: site.readers),
+    }
+
+    def validators(self, request):
+        # Выгрузка JSONL идёт потоком: её не кэшируем и не проверяем.
+        if (request.get('request_params') or {}).get('format') == 'jsonl':
+            return None
+        return site.versions.get()
+
     @Debug(name='CourseApi')
     def __call__(self, request):
-        return '200 OK', BaseSerializer(site.notes).save()
+        resource = (request.get('path_params') or {}).get('resource', 'notes')
+        params = request.get('request_params') or {}
+        if resource not in self.resources:
+            request.add_header('Content-Type', 'application/json; charset=utf-8')
+            return '404 Not Found', '{"error":"unknown resource"}'
+        schema, collection = self.resources[resource]
+        fields = params.get('fields')
+        stream = JsonStream(schema(fields.split(',') if fields else None))
+
+        if params.get('format') == 'jsonl':
+            request.add_header('Content-Type', 'application/x-ndjson; charset=utf-8')
+            return '200 OK', stream.lines(collection())
+
+        limit = params.get('limit', '')
+        page_size = min(int(limit), API_MAX_PAGE_SIZE) if limit.isdigit() and int(limit) > 0 else API_PAGE_SIZE
+        request.add_header('Content-Type', 'application/json; charset=utf-8')
+        return '200 OK', stream.page(QuerySet.from_params(collection(), params, page_size=page_size))
+
+def search_page(request):
+    """
+    Страница поиска по параметрам q, category и page.
+    :return: (ResultPage, категория или None)
+    """
+    params = request.get('request_params') or {}
+    query = params.get('q', '')
+    category = None
+    category_id = params.get('category', '')
+    if category_id.isdigit():
+        category = site.categories.get(int(category_id))
+    page = params.get('page', '1')
+    number = int(page) if page.isdigit() and int(page) > 0 else 1
+    notes, has_next = site.search_notes(query, category, (number - 1) * SEARCH_PAGE_SIZE, SEARCH_PAGE_SIZE)
+    return ResultPage(notes, number, has_next, ordering='rank'), category
+
+
+# Контроллер - поиск заметок.
+@AppRoute(routes=routes, url='/search/', cache_page=True)
+class Search:
+
+    def validators(self, request):
+        return site.versions.get()
+
+    @Debug(name='Search')
+    def __call__(self, request):
+        results, category = search_page(request)
+        params = request.get('request_params') or {}
+        return '200 OK', render('search.html', data=request.get('data', None), results=results,
+                                query=params.get('q', ''), category=category,
+                                categories=site.categories)
+
+
+# JSON API поиска: /api/search/?q=...&category=...&page=...&fields=...
+@AppRoute(routes=routes, url='/api/search/', fronts=(), cache_page=True)
+class SearchApi:
+
+    def validators(self, request):
+        return site.versions.get()
+
+    @Debug(name='SearchApi')
+    def __call__(self, request):
+        results, category = search_page(request)
+        fields = (request.get('request_params') or {}).get('fields')
+        request.add_header('Content-Type', 'application/json; charset=utf-8')
+        return '200 OK', JsonStream(NoteSchema(fields.split(',') if fields else None)).page(results)
+
+
+# Счётчики кэша страниц.
+@AppRoute(routes=routes, url='/cache-stats/', fronts=())
+class CacheStats:
+    def __call__(self, request):
+        request.add_header('Content-Type', 'application/json; charset=utf-8')
+        return '200 OK', json.dumps(response_cache.stats())
 
 class NotFound404:
 